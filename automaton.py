@@ -3,18 +3,25 @@
 
 
 from collections import deque
+from array import array
 from itertools import product, chain
 from time import time
 from pathlib import Path
+import asyncio
+from struct import Struct, error as StructError
+from zlib import crc32
+from hashlib import blake2b
+from random import Random
 
-from utils import memoize, parallel, randbelow
+from utils import memoize, parallel, parallel_map, randbelow
 from rings import *
 from polynomial import *
 from linear import *
-from jit_types import Compiler
+from loader import buffer_address, wrap_stream_kernel
+from equivalence import check_equivalence
 
 
-__all__ = 'automaton_factory',
+__all__ = 'automaton_factory', 'AutomatonChain', 'AutomatonTable', 'LinearAutomaton', 'AutomatonSessionPool'
 
 
 def automaton_factory(base_ring):
@@ -48,8 +55,8 @@ def automaton_factory(base_ring):
 			def keys(self):
 				return self.backstore.keys()
 		
-		x = CacheDict((lambda k: base_polynomial.var(f'x_{k}')), (lambda k: k >= 0))
-		s = CacheDict((lambda k: base_polynomial.var(f's_{k[0]}_{k[1]}')), (lambda k: k[0] >= 1 and k[1] >= 0))
+		x = CacheDict((lambda k: base_polynomial.var(f'x_{k}', kind='x', time=0, index=k)), (lambda k: k >= 0))
+		s = CacheDict((lambda k: base_polynomial.var(f's_{k[0]}_{k[1]}', kind='s', time=k[0], index=k[1])), (lambda k: k[0] >= 1 and k[1] >= 0))
 		
 		def __init__(self, output_transition=None, state_transition=None):
 			"""
@@ -72,6 +79,25 @@ def automaton_factory(base_ring):
 			Returns the output symbol. The automaton state (`history`) is modified in place.
 			"""
 			
+			if x.algebra.base_ring != base_ring or any(_sh.algebra.base_ring != base_ring for _sh in history):
+				return self.symbolic_transition(x, history)
+			
+			slots = self.slot_layout
+			values = [_si for _sh in history for _si in _sh]
+			values.extend(x)
+			
+			cache = {}
+			y = self.output_transition.evaluate_slots(slots, values, cache)
+			s = self.state_transition.evaluate_slots(slots, values, cache)
+			
+			history.insert(0, s)
+			while len(history) > self.memory_length:
+				history.pop()
+			return y
+		
+		def symbolic_transition(self, x, history):
+			"Same as `transition`, but accepts input and state vectors of polynomials. Variables are substituted by name."
+			
 			state = {}
 			for t, sh in enumerate(history):
 				for i, si in enumerate(sh):
@@ -96,10 +122,45 @@ def automaton_factory(base_ring):
 				history.pop()
 			return y
 		
-		def __call__(self, in_stream, initial_state=None):
-			"Takes the stream of input symbols, yields the stream of output symbols. Starts from the state composed of zero vectors."
+		@property
+		def slot_layout(self):
+			"""
+			Mapping from variable names to positions in the flat valuation array used by `transition` and compiled code.
+			The array holds the state history first (`s[t, i]` at `(t - 1) * memory_width + i`), followed by the input symbol (`x[i]` at `memory_length * memory_width + i`).
+			"""
+			
+			try:
+				output_transition, state_transition, slots = self.slot_layout_cache
+				if output_transition is self.output_transition and state_transition is self.state_transition:
+					return slots
+			except AttributeError:
+				pass
+			
+			length = self.memory_length
+			width = self.memory_width
+			slots = {}
+			for n in self.variable_ids():
+				kind, t, i = variable_registry.metadata[n]
+				if kind == 's':
+					slots[variable_registry.names[n]] = (t - 1) * width + i
+				elif kind == 'x':
+					slots[variable_registry.names[n]] = length * width + i
+				else:
+					raise ValueError(f"Unrecognized variable: {variable_registry.names[n]}.")
+			
+			self.slot_layout_cache = self.output_transition, self.state_transition, slots
+			return slots
+		
+		def __call__(self, in_stream, initial_state=None, history=None):
+			"""
+			Takes the stream of input symbols, yields the stream of output symbols. Starts from the state composed of zero vectors.
+			If `history` is provided (a queue of vectors, see `load_state`), it is used as the initial state and updated in place.
+			"""
 			
-			if initial_state == None:
+			if history is not None:
+				if len(history) != self.memory_length:
+					raise ValueError("Invalid initial state length")
+			elif initial_state == None:
 				history = deque([base_const_vector.zero(self.memory_width)] * self.memory_length) # initial state
 			else:
 				history = deque(initial_state)
@@ -111,59 +172,470 @@ def automaton_factory(base_ring):
 			for x in in_stream:
 				yield self.transition(x, history)
 		
+		@staticmethod
+		def symbol_bytes(width):
+			"Size in bytes of a packed vector of `width` elements."
+			return (width * element_bits + 7) // 8
+		
+		@classmethod
+		def pack_symbols(cls, vectors, width):
+			"Pack the vectors of length `width` into a buffer, element `i` of each vector at bit `i * element_bits`, little-endian."
+			length = cls.symbol_bytes(width)
+			result = bytearray()
+			for vector in vectors:
+				if vector.dimension != width:
+					raise ValueError("Invalid vector width")
+				result += sum(int(_el) << (_i * element_bits) for (_i, _el) in enumerate(vector)).to_bytes(length, 'little')
+			return result
+		
+		@classmethod
+		def unpack_symbols(cls, data, width):
+			"Inverse of `pack_symbols`. Returns the list of constant vectors."
+			data = memoryview(data).cast('B')
+			length = cls.symbol_bytes(width)
+			if not length:
+				return []
+			if len(data) % length:
+				raise ValueError("Buffer size is not a multiple of the symbol size")
+			mask = (1 << element_bits) - 1
+			result = []
+			for n in range(0, len(data), length):
+				v = int.from_bytes(data[n:n + length], 'little')
+				result.append(base_const_vector([base_ring((v >> (_i * element_bits)) & mask) for _i in range(width)]))
+			return result
+		
+		@property
+		def packed_state_size(self):
+			"Size in bytes of the packed automaton state accepted by `stream` and compiled stream functions."
+			return self.memory_length * self.symbol_bytes(self.memory_width)
+		
+		def stream(self, data, state=None):
+			"""
+			Buffer interface, taking the packed input symbols (see `pack_symbols`) and returning the packed output symbols as a `bytearray`.
+			The `state` buffer (of `packed_state_size` bytes, newest vector first) is used as the initial state and updated in place.
+			Works the same as the function returned from `wrap_compiled_stream`.
+			"""
+			
+			history = deque([base_const_vector.zero(self.memory_width)] * self.memory_length)
+			if state is not None:
+				if len(memoryview(state).cast('B')) != self.packed_state_size:
+					raise ValueError("Invalid state buffer size")
+				history = deque(self.unpack_symbols(state, self.memory_width))
+			
+			result = self.pack_symbols((self.transition(_x, history) for _x in self.unpack_symbols(data, self.input_width)), self.output_size)
+			
+			if state is not None:
+				memoryview(state).cast('B')[:] = self.pack_symbols(history, self.memory_width)
+			return result
+		
+		@property
+		def fingerprint(self):
+			"64-bit fingerprint of the transition functions, computed from their values on fixed pseudorandom valuations. Stable between processes."
+			
+			try:
+				output_transition, state_transition, fingerprint = self.fingerprint_cache
+				if output_transition is self.output_transition and state_transition is self.state_transition:
+					return fingerprint
+			except AttributeError:
+				pass
+			
+			slots = self.slot_layout
+			n = self.memory_length * self.memory_width + self.input_width
+			generator = Random(0x46415043)
+			digest = blake2b(digest_size=8)
+			if base_ring.size == 2:
+				words = [generator.getrandbits(64) for _j in range(n)]
+				cache = {}
+				results = self.output_transition.evaluate_bitsliced(slots, words, (1 << 64) - 1, cache) + self.state_transition.evaluate_bitsliced(slots, words, (1 << 64) - 1, cache)
+				digest.update(repr(results).encode())
+			else:
+				for k in range(8):
+					values = [base_ring(generator.randrange(base_ring.size)) for _j in range(n)]
+					cache = {}
+					digest.update(repr([int(_el) for _el in chain(self.output_transition.evaluate_slots(slots, values, cache), self.state_transition.evaluate_slots(slots, values, cache))]).encode())
+			fingerprint = int.from_bytes(digest.digest(), 'little')
+			
+			self.fingerprint_cache = self.output_transition, self.state_transition, fingerprint
+			return fingerprint
+		
+		state_header = Struct('<4sIHHQ') # magic, ring, memory length, memory width, fingerprint
+		state_magic = b'FAst'
+		
+		def save_state(self, history):
+			"""
+			Serialize the automaton state to `bytes`: a 20-byte header (ring, dimensions, `fingerprint`) followed by the history packed as by `stream`.
+			`history` may be a queue of vectors (`__call__`, `transition`), a flat list of ints (`wrap_compiled`) or a packed state buffer (`stream`, `wrap_compiled_stream`).
+			"""
+			
+			length = self.memory_length
+			width = self.memory_width
+			if isinstance(history, (bytes, bytearray, memoryview, array)):
+				packed = bytes(memoryview(history).cast('B'))
+				if len(packed) != self.packed_state_size:
+					raise ValueError("Invalid state buffer size")
+			else:
+				if len(history) == length and all(hasattr(_sh, 'dimension') for _sh in history):
+					if any(_sh.dimension != width for _sh in history):
+						raise ValueError("Invalid vector width in state")
+					elements = [_si for _sh in history for _si in _sh]
+				elif len(history) == length * width:
+					elements = history
+				else:
+					raise ValueError("Invalid state length")
+				size = self.symbol_bytes(width)
+				packed = b''.join(sum(int(_el) << (_i * element_bits) for (_i, _el) in enumerate(elements[_t * width:(_t + 1) * width])).to_bytes(size, 'little') for _t in range(length))
+			
+			return self.state_header.pack(self.state_magic, crc32(str(base_ring).encode()), length, width, self.fingerprint) + packed
+		
+		def load_state(self, data, form='vectors'):
+			"""
+			Inverse of `save_state`. Returns a queue of vectors to be passed as `history` to `__call__` (`form='vectors'`), a flat list of ints
+			to be passed to functions returned from `wrap_compiled` (`form='flat'`) or a packed state buffer for `stream` (`form='packed'`).
+			Raises `ValueError` if the snapshot does not belong to this automaton.
+			"""
+			
+			data = memoryview(data).cast('B')
+			header = self.state_header.size
+			try:
+				magic, ring, length, width, fingerprint = self.state_header.unpack(data[:header])
+			except StructError:
+				raise ValueError("Truncated state snapshot")
+			if magic != self.state_magic:
+				raise ValueError("Not a state snapshot")
+			if ring != crc32(str(base_ring).encode()) or length != self.memory_length or width != self.memory_width or fingerprint != self.fingerprint:
+				raise ValueError("State snapshot belongs to a different automaton")
+			packed = data[header:]
+			if len(packed) != self.packed_state_size:
+				raise ValueError("Invalid state snapshot size")
+			
+			if form == 'packed':
+				return bytearray(packed)
+			elif form == 'vectors':
+				return deque(self.unpack_symbols(packed, width))
+			elif form == 'flat':
+				history = int.from_bytes(packed, 'little')
+				vector_bits = self.symbol_bytes(width) * 8
+				mask = (1 << element_bits) - 1
+				return [(history >> (_t * vector_bits + _i * element_bits)) & mask for _t in range(length) for _i in range(width)]
+			else:
+				raise ValueError(f"Unknown state form: {form}.")
+		
+		def tabulate(self, max_bits=24):
+			"""
+			Evaluate the automaton on all combinations of state and input and return the `AutomatonTable` running streams by table lookup.
+			Requires NumPy. Raises `ValueError` if the input symbol and the state together are wider than `max_bits` bits.
+			"""
+			
+			import numpy
+			
+			length = self.memory_length
+			width = self.memory_width
+			input_width = self.input_width
+			slots = self.slot_layout
+			bits = (length * width + input_width) * element_bits
+			if bits > max_bits:
+				raise ValueError(f"Automaton too big to tabulate: {bits} bits of state and input, limit {max_bits}.")
+			
+			def table_type(bits):
+				for dtype in numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64:
+					if bits <= 8 * numpy.dtype(dtype).itemsize:
+						return dtype
+				raise ValueError("Symbol too wide to tabulate.")
+			
+			output_table = numpy.zeros(1 << bits, dtype=table_type(self.output_size * element_bits))
+			state_table = numpy.zeros(1 << bits, dtype=table_type(width * element_bits if length else 0))
+			
+			if base_ring.size == 2:
+				# bitsliced evaluation on all valuations at once, valuation `k` at bit `k` of the word
+				size = max(bits, 3)
+				words = []
+				for j in range(length * width + input_width):
+					if j < 3:
+						pattern = bytes([(0xaa, 0xcc, 0xf0)[j]]) * (1 << (size - 3))
+					else:
+						half = 1 << (j - 3)
+						pattern = (bytes(half) + b'\xff' * half) * (1 << (size - j - 1))
+					words.append(int.from_bytes(pattern, 'little'))
+				mask = (1 << (1 << size)) - 1
+				
+				def unpack_word(word):
+					return numpy.unpackbits(numpy.frombuffer(word.to_bytes(1 << (size - 3), 'little'), dtype=numpy.uint8), bitorder='little')[:1 << bits]
+				
+				cache = {}
+				for i, word in enumerate(self.output_transition.evaluate_bitsliced(slots, words, mask, cache)):
+					output_table |= unpack_word(word).astype(output_table.dtype) << i
+				if length:
+					for i, word in enumerate(self.state_transition.evaluate_bitsliced(slots, words, mask, cache)):
+						state_table |= unpack_word(word).astype(state_table.dtype) << i
+			else:
+				for values in product(range(base_ring.size), repeat=length * width + input_width):
+					index = sum(_v << (_j * element_bits) for (_j, _v) in enumerate(values))
+					values = [base_ring(_v) for _v in values]
+					cache = {}
+					output_table[index] = sum(int(_y) << (_i * element_bits) for (_i, _y) in enumerate(self.output_transition.evaluate_slots(slots, values, cache)))
+					if length:
+						state_table[index] = sum(int(_s) << (_i * element_bits) for (_i, _s) in enumerate(self.state_transition.evaluate_slots(slots, values, cache)))
+			
+			return AutomatonTable(self, output_table, state_table)
+		
+		def is_linear(self):
+			"Whether all the transition functions are affine, judged from their structure (see `Polynomial.structural_degree`)."
+			cache = {}
+			return all(_c.structural_degree(cache) <= 1 for _c in chain(self.output_transition, self.state_transition))
+		
+		def linearize(self):
+			"Return the `LinearAutomaton` execution mode of this automaton. Raises `ValueError` if the ring is not of size 2 or the automaton is not linear."
+			
+			if base_ring.size != 2:
+				raise ValueError("Linear execution mode requires a ring of size 2.")
+			if not self.is_linear():
+				raise ValueError("Automaton is not linear.")
+			
+			# evaluate on all unit vectors (valuation `j`) and on zero (valuation `n`) at once
+			n = self.memory_length * self.memory_width + self.input_width
+			words = [1 << _j for _j in range(n)]
+			mask = (1 << (n + 1)) - 1
+			slots = self.slot_layout
+			cache = {}
+			output_words = self.output_transition.evaluate_bitsliced(slots, words, mask, cache)
+			state_words = self.state_transition.evaluate_bitsliced(slots, words, mask, cache)
+			
+			def columns(results):
+				constant = sum(((_w >> n) & 1) << _i for (_i, _w) in enumerate(results))
+				return [sum((((_w >> _j) ^ (_w >> n)) & 1) << _i for (_i, _w) in enumerate(results)) for _j in range(n)], constant
+			
+			output_columns, output_const = columns(output_words)
+			state_columns, state_const = columns(state_words) if self.memory_length else ([0] * n, 0)
+			return LinearAutomaton(self, output_columns, state_columns, output_const, state_const)
+		
+		async def astream(self, reader, writer, stream=None, state=None, chunk_size=1 << 16, executor=None):
+			"""
+			Asynchronous buffer interface. Reads packed input symbols from the `asyncio.StreamReader` `reader` as they arrive, at most `chunk_size` bytes at once,
+			processes the complete symbols read so far as one chunk (a partial symbol is kept for the next read) and writes the packed output
+			to the `asyncio.StreamWriter` `writer`, waiting on `writer.drain()` after every chunk. Interactive peers get the output of every symbol they sent.
+			`stream` is the function processing one chunk (`Automaton.stream` by default, or the result of `wrap_compiled_stream`), run in `executor`
+			(the default executor of the event loop if `None`). The packed `state` is carried between chunks and updated in place, so the output is the same
+			as from a single blocking call. Returns the final state.
+			"""
+			
+			if stream is None:
+				stream = self.stream
+			if state is None:
+				state = bytearray(self.packed_state_size)
+			
+			symbol_size = self.symbol_bytes(self.input_width)
+			if not symbol_size:
+				raise ValueError("Automaton does not read any input")
+			chunk_size = max(chunk_size, symbol_size)
+			
+			loop = asyncio.get_running_loop()
+			pending = bytearray()
+			while True:
+				data = await reader.read(chunk_size - len(pending))
+				if not data:
+					break
+				pending += data
+				
+				usable = len(pending) - len(pending) % symbol_size
+				if not usable:
+					continue
+				chunk = bytes(pending[:usable])
+				del pending[:usable]
+				
+				writer.write(await loop.run_in_executor(executor, stream, chunk, state))
+				await writer.drain()
+			
+			if pending:
+				raise ValueError("Incomplete symbol at the end of stream")
+			return state
+		
+		@classmethod
+		def bitslice_streams(cls, streams, width):
+			"""
+			Transpose up to 64 packed symbol streams of equal length (see `pack_symbols`) into the bitsliced layout, returned as `array('Q')`.
+			Word `n * width + i` holds the element `i` of the symbol `n`; its bit `k` comes from the stream `k`.
+			Packed states can be transposed the same way, passing `memory_width` as `width`.
+			"""
+			
+			if element_bits != 1:
+				raise ValueError("Bitslicing requires a ring of size 2.")
+			streams = [memoryview(_stream).cast('B') for _stream in streams]
+			if len(streams) > 64:
+				raise ValueError("At most 64 streams fit in a word.")
+			if len(frozenset(len(_stream) for _stream in streams)) > 1:
+				raise ValueError("Streams must have the same length.")
+			
+			length = cls.symbol_bytes(width)
+			size = len(streams[0]) if streams else 0
+			if length and size % length:
+				raise ValueError("Buffer size is not a multiple of the symbol size")
+			count = size // length if length else 0
+			
+			result = array('Q', bytes(8 * count * width))
+			for k, stream in enumerate(streams):
+				bit = 1 << k
+				for n in range(count):
+					v = int.from_bytes(stream[n * length:(n + 1) * length], 'little')
+					while v:
+						i = (v & -v).bit_length() - 1
+						result[n * width + i] |= bit
+						v &= v - 1
+			return result
+		
+		@classmethod
+		def unbitslice_streams(cls, words, width, sessions):
+			"Inverse of `bitslice_streams`, returns the list of `sessions` packed streams."
+			
+			if element_bits != 1:
+				raise ValueError("Bitslicing requires a ring of size 2.")
+			words = memoryview(words).cast('B').cast('Q')
+			if width and len(words) % width:
+				raise ValueError("Buffer size is not a multiple of the symbol size")
+			
+			length = cls.symbol_bytes(width)
+			count = len(words) // width if width else 0
+			result = [bytearray(count * length) for _k in range(sessions)]
+			for n in range(count):
+				symbols = [0] * sessions
+				for i in range(width):
+					w = words[n * width + i]
+					while w:
+						k = (w & -w).bit_length() - 1
+						if k < sessions:
+							symbols[k] |= 1 << i
+						w &= w - 1
+				for k in range(sessions):
+					result[k][n * length:(n + 1) * length] = symbols[k].to_bytes(length, 'little')
+			return result
+		
+		def stream_bitsliced(self, words, state=None):
+			"""
+			Run 64 sessions of the automaton in lock-step over a ring of size 2. `words` is the bitsliced input (see `bitslice_streams`),
+			`state` is the bitsliced state of `memory_length * memory_width` words (updated in place). Returns the bitsliced output as `array('Q')`.
+			Works the same as the function returned from `wrap_compiled_bitsliced`.
+			"""
+			
+			words = memoryview(words).cast('B').cast('Q')
+			input_width = self.input_width
+			if not input_width:
+				raise ValueError("Automaton does not read any input")
+			if len(words) % input_width:
+				raise ValueError("Buffer size is not a multiple of the symbol size")
+			
+			length = self.memory_length
+			width = self.memory_width
+			if state is None:
+				history = [0] * (length * width)
+			else:
+				history = list(memoryview(state).cast('B').cast('Q'))
+				if len(history) != length * width:
+					raise ValueError("Invalid state buffer size")
+			
+			slots = self.slot_layout
+			mask = (1 << 64) - 1
+			result = array('Q')
+			for n in range(0, len(words), input_width):
+				values = history + list(words[n:n + input_width])
+				cache = {}
+				result.extend(self.output_transition.evaluate_bitsliced(slots, values, mask, cache))
+				if length:
+					history = self.state_transition.evaluate_bitsliced(slots, values, mask, cache) + history[:-width]
+			
+			if state is not None:
+				memoryview(state).cast('B').cast('Q')[:] = array('Q', history)
+			return result
+		
+		def vectorize(self):
+			"Return the NumPy programs `(output, state)` evaluating the transition functions on arrays of flat valuations, see `vectorized.Program`. Requires NumPy."
+			try:
+				output_transition, state_transition, programs = self.vectorize_cache
+				if output_transition is self.output_transition and state_transition is self.state_transition:
+					return programs
+			except AttributeError:
+				pass
+			
+			slots = self.slot_layout
+			programs = self.output_transition.vectorize(slots), self.state_transition.vectorize(slots)
+			self.vectorize_cache = self.output_transition, self.state_transition, programs
+			return programs
+		
+		def stream_batch(self, inputs, state=None):
+			"""
+			Run a batch of sessions in lock-step with the NumPy evaluator. `inputs` is an array of shape `(count, input_width, ...)`,
+			the trailing dimensions enumerating the sessions, `state` an array of shape `(memory_length * memory_width, ...)` (newest state first, updated in place).
+			Over a ring of size 2 every element is a `uint64` word carrying 64 sessions (see `bitslice_streams`), over `ModularRing` it is one session's element.
+			Returns the array of shape `(count, output_size, ...)`.
+			"""
+			
+			import numpy
+			
+			output_program, state_program = self.vectorize()
+			inputs = numpy.asarray(inputs, dtype=numpy.uint64)
+			if inputs.ndim < 2 or inputs.shape[1] != self.input_width:
+				raise ValueError("Invalid input array shape")
+			
+			length = self.memory_length
+			width = self.memory_width
+			shape = inputs.shape[2:]
+			if state is None:
+				history = numpy.zeros((length * width,) + shape, dtype=numpy.uint64)
+			else:
+				if state.shape != (length * width,) + shape:
+					raise ValueError("Invalid state array shape")
+				history = numpy.array(state, dtype=numpy.uint64)
+			
+			result = numpy.empty((len(inputs), self.output_size) + shape, dtype=numpy.uint64)
+			for n, x in enumerate(inputs):
+				values = numpy.concatenate((history, x))
+				result[n] = output_program(values)
+				if length:
+					history = numpy.concatenate((state_program(values), history[:-width]))
+			
+			if state is not None:
+				state[...] = history
+			return result
+		
 		def __matmul__(self, other):
 			"Automaton composition."
 			
 			shift = other.memory_width
+			output = list(other.output_transition)
 			
 			substitution = {}
-			for i, yi in enumerate(other.output_transition):
-				substitution[str(self.x[i])] = yi
-			for t in range(1, self.memory_length + 1):
-				for i in range(self.memory_width):
-					substitution[str(self.s[t, i])] = self.s[t, i + shift]
+			for n in self.variable_ids():
+				kind, t, i = variable_registry.metadata[n]
+				if kind == 'x' and i < len(output):
+					substitution[n] = output[i]
+				elif kind == 's':
+					substitution[n] = self.s[t, i + shift]
 			
-			output_transition = base_vector(_trans(**substitution) for _trans in self.output_transition)
-			state_transition = base_vector(chain(other.state_transition, (_trans(**substitution) for _trans in self.state_transition)))
+			cache = {}
+			output_transition = self.output_transition.substitute_variables(substitution, cache)
+			state_transition = base_vector(chain(other.state_transition, self.state_transition.substitute_variables(substitution, cache)))
 			
 			return self.__class__(output_transition, state_transition)
 		
+		def variable_ids(self):
+			"Ids (see `variable_registry`) of all variables occurring in the transition functions."
+			return frozenset(_v.variable_id for _v in frozenset().union(*[_c.variables() for _c in self.state_transition.values()], *[_c.variables() for _c in self.output_transition.values()]))
+		
 		@property
 		def input_size(self):
-			v = frozenset().union(*[_c.variables() for _c in self.state_transition.values()]) | frozenset().union(*[_c.variables() for _c in self.output_transition.values()])
-			if not v:
-				return 0
-			m = 0
-			for var in v:
-				for k in self.x.keys():
-					if self.x[k] == var:
-						m = max(m, k)
-			return m
+			return max((variable_registry.index(_n) for _n in self.variable_ids() if variable_registry.kind(_n) == 'x'), default=0)
 		
 		@property
 		def output_size(self):
 			return self.output_transition.dimension
 		
+		@property
+		def input_width(self):
+			"Number of elements of the input symbol that the automaton reads (highest input variable index + 1)."
+			return max((variable_registry.index(_n) + 1 for _n in self.variable_ids() if variable_registry.kind(_n) == 'x'), default=0)
+		
 		@property
 		@memoize
 		def memory_length(self):
-			v = frozenset(str(_v) for _v in frozenset().union(*[_c.variables() for _c in self.state_transition.values()]) | frozenset().union(*[_c.variables() for _c in self.output_transition.values()]))
-			if not v:
-				return 0
-			
-			m = 0
-			for va in v:
-				vs = str(va).split('_')
-				if vs[0] != 's': continue # FIXME: assumes variable naming
-				m = max(m, int(vs[1]))
-			
-			#m = 0
-			#for i in range(1, 64): # FIXME: remove hard limits
-			#	for j in range(256):
-			#		if str(self.s[i, j]) in v:
-			#			m = i
-			
-			return m
+			return max((variable_registry.time(_n) for _n in self.variable_ids() if variable_registry.kind(_n) == 's'), default=0)
 		
 		@property
 		@memoize
@@ -171,23 +643,28 @@ def automaton_factory(base_ring):
 			#print("memory_width", self.state_transition.dimension)
 			return self.state_transition.dimension
 		
+		verify_optimization = True # check `optimize` results with `check_equivalence`, also when assertions are off
+		
 		def optimize(self):
+			"""
+			Replace the transition functions with optimized circuits. Unless `verify_optimization` is false, the results are checked for equivalence first
+			within the default budget and time limit of `check_equivalence`, raising `ArithmeticError` on a counterexample. The report is kept in `optimization_report` as `(output, state)` pair of `Equivalence` objects.
+			"""
+			
 			output_transition = self.output_transition.optimized()
 			state_transition = self.state_transition.optimized()
 			
-			#print([[str(_v) for _v in _x.variables()] for _x in self.output_transition.canonical()])
-			#print([[str(_v) for _v in _x.variables()] for _x in output_transition.canonical()])
-			#print([[str(_v) for _v in _x.variables()] for _x in self.state_transition.canonical()])
-			#print([[str(_v) for _v in _x.variables()] for _x in state_transition.canonical()])
-			
-			assert self.output_transition == output_transition, f"{str(self.output_transition)} == {str(output_transition)}"
-			assert self.state_transition == state_transition, f"{str(self.state_transition)} == {str(state_transition)}"
+			if self.verify_optimization:
+				output_report = check_equivalence(self.output_transition, output_transition)
+				if not output_report:
+					raise ArithmeticError(f"Optimized output transition is not equivalent: {output_report}.")
+				state_report = check_equivalence(self.state_transition, state_transition)
+				if not state_report:
+					raise ArithmeticError(f"Optimized state transition is not equivalent: {state_report}.")
+				self.optimization_report = output_report, state_report
 			
 			self.output_transition = output_transition
 			self.state_transition = state_transition
-			
-			#self.output_transition = self.output_transition.optimized()
-			#self.state_transition = self.state_transition.optimized()
 		
 		@staticmethod
 		def random_nonlinear_equation_pair(length):
@@ -230,23 +707,26 @@ def automaton_factory(base_ring):
 			
 			print("calculating unmix substitution")
 			#unmixed = unmix @ base_vector(self.s[t, _i] for _i in range(self.memory_width))
-			unmixed = unmix @ base_vector(base_polynomial.var(f'c_{_i}') for _i in range(self.memory_width))
-			unmixed = unmix_nonlinear(**{f'a_{_i}' : unmixed[_i] for _i in range(self.memory_width)})
+			c = [base_polynomial.var(f'c_{_i}') for _i in range(self.memory_width)]
+			unmixed = unmix @ base_vector(c)
+			unmixed = unmix_nonlinear.substitute_variables({base_polynomial.var(f'a_{_i}').variable_id : unmixed[_i] for _i in range(self.memory_width)})
 			print(" before optimization:", [_c.circuit_size() for _c in unmixed])
 			unmixed = unmixed.optimized()
 			print(" after optimization:", [_c.circuit_size() for _c in unmixed])
 			
 			substitution = {}
 			for t in range(1, self.memory_length + 1):
+				unmixed_t = unmixed.substitute_variables({c[_i].variable_id : self.s[t, _i] for _i in range(self.memory_width)})
 				for i in range(self.memory_width):
-					substitution[str(self.s[t, i])] = unmixed[i](**{f'c_{_i}' : self.s[t, _i] for _i in range(self.memory_width)})
+					substitution[self.s[t, i].variable_id] = unmixed_t[i]
 			
+			cache = {}
 			print("applying state transition")
-			bvt = base_vector(_trans(**substitution) for _trans in self.state_transition).optimized()
-			self.state_transition = (mix @ mix_nonlinear(**{f'b_{_i}' : bvt[_i] for _i in range(self.memory_width)}))
+			bvt = self.state_transition.substitute_variables(substitution, cache).optimized()
+			self.state_transition = (mix @ mix_nonlinear.substitute_variables({base_polynomial.var(f'b_{_i}').variable_id : bvt[_i] for _i in range(self.memory_width)}))
 			#self.state_transition = mix @ bvt
 			print("applying output transition")
-			self.output_transition = base_vector(_trans(**substitution) for _trans in self.output_transition)
+			self.output_transition = self.output_transition.substitute_variables(substitution, cache)
 		
 		@classmethod
 		def countdown(cls, block_size, memory_size, offset, length, period): # TODO
@@ -617,37 +1097,73 @@ def automaton_factory(base_ring):
 			return straight, inverse
 		
 		def compile(self, name, module):
-			self.state_transition.compile(name + '_st', module)
-			self.output_transition.compile(name + '_ot', module)
+			Vector.compile_all([(name + '_st', self.state_transition), (name + '_ot', self.output_transition)], module)
+			self.declare_stream_kernel(name + '_stream', module, name + '_ot', name + '_st', 1 << (element_bits - 1).bit_length() if element_bits > 8 else 8, element_bits)
 		
-		def wrap_compiled(self, name, engine):
-			st = self.state_transition.wrap_compiled(name + '_st', engine)
-			ot = self.output_transition.wrap_compiled(name + '_ot', engine)
-			
-			def t(x, history):
-				state = {}
-				for t, sh in enumerate(history):
-					for i, si in enumerate(sh):
-						state[str(self.s[t + 1, i])] = si
-				for i, xi in enumerate(x):
-					state[str(self.x[i])] = xi
-				
-				y = ot(**state)
-				s = st(**state)
-				
-				history.insert(0, s)
-				while len(history) > self.memory_length:
-					history.pop()
-				return y
+		def declare_stream_kernel(self, kernel_name, module, output_prefix, state_prefix, bits, element_bits):
+			"Emit the native stream loop calling the already compiled component functions `{output_prefix}_{n}` and `{state_prefix}_{n}`."
+			
+			slots = self.slot_layout
+			def arguments(component):
+				return [slots[_var] for _var in sorted([str(_var) for _var in component.variables()])]
 			
-			def fn(in_stream):
-				history = deque([base_vector.zero(self.memory_width)] * self.memory_length)
+			output_functions = [(f'{output_prefix}_{_n}', arguments(_c)) for (_n, _c) in enumerate(self.output_transition)]
+			state_functions = [(f'{state_prefix}_{_n}', arguments(_c)) for (_n, _c) in enumerate(self.state_transition)]
+			module.declare_stream_function(kernel_name, bits, element_bits, self.input_width, self.output_size, self.memory_length, self.memory_width, output_functions, state_functions)
+			
+			def size(width):
+				return (width * element_bits + 7) // 8
+			module.array(kernel_name + '_info', 64, [size(self.input_width), size(self.output_size), self.memory_length * size(self.memory_width)]) # buffer sizes for `loader.Library`
+		
+		def wrap_compiled(self, name, engine):
+			slots = self.slot_layout
+			st = self.state_transition.wrap_compiled_slots(name + '_st', engine, slots)
+			ot = self.output_transition.wrap_compiled_slots(name + '_ot', engine, slots)
+			
+			length = self.memory_length
+			width = self.memory_width
+			
+			def fn(in_stream, state=None):
+				"`state` is the flat history (newest state first, see `load_state`), updated in place."
+				if state is None:
+					state = [0] * (length * width)
+				elif len(state) != length * width:
+					raise ValueError("Invalid state length")
 				for x in in_stream:
-					yield t(x, history)
+					values = state + [int(_xi) for _xi in x]
+					y = ot(values)
+					if length:
+						s = st(values)
+						state[width:] = state[:-width]
+						state[:width] = [int(_si) for _si in s]
+					yield y
+			
+			return fn
+		
+		def wrap_compiled_stream(self, name, engine):
+			"""
+			Returns the function `fn(data, state=None)` running the whole compiled stream loop in native code, see `stream`.
+			`data` may be any contiguous buffer (`bytes`, `bytearray`, `memoryview`, NumPy array) of packed input symbols.
+			"""
 			
-			return fn	
+			in_bytes = self.symbol_bytes(self.input_width)
+			out_bytes = self.symbol_bytes(self.output_size)
+			return wrap_stream_kernel(engine.symbol[name + '_stream'], name, in_bytes, out_bytes, self.packed_state_size, bytearray)
+		
+		def compile_bitsliced(self, name, module):
+			"Compile the bitsliced evaluator of 64 sessions at once, see `stream_bitsliced`. Requires a ring of size 2."
+			self.state_transition.compile_bitsliced(name + '_bst', module)
+			self.output_transition.compile_bitsliced(name + '_bot', module)
+			self.declare_stream_kernel(name + '_bitsliced', module, name + '_bot', name + '_bst', 64, 64)
+		
+		def wrap_compiled_bitsliced(self, name, engine):
+			"Returns the function `fn(words, state=None)` running the native bitsliced stream loop, see `stream_bitsliced`."
+			return wrap_stream_kernel(engine.symbol[name + '_bitsliced'], name, 8 * self.input_width, 8 * self.output_size, 8 * self.memory_length * self.memory_width, lambda _size: array('Q', bytes(_size)))
+	
 	
+	element_bits = (base_ring.size - 1).bit_length()
 	
+	Automaton.element_bits = element_bits
 	Automaton.base_ring = base_ring
 	Automaton.base_const_vector = base_const_vector
 	Automaton.base_const_matrix = base_const_matrix
@@ -662,10 +1178,534 @@ def automaton_factory(base_ring):
 	return Automaton
 
 
+def pack_history(automaton, state):
+	"Convert the packed state buffer (see `Automaton.packed_state_size`) to an integer, element of `s[t, i]` at bit `((t - 1) * memory_width + i) * element_bits`."
+	state = memoryview(state).cast('B')
+	length = automaton.symbol_bytes(automaton.memory_width)
+	vector_bits = automaton.memory_width * automaton.element_bits
+	return sum(int.from_bytes(state[_t * length:(_t + 1) * length], 'little') << (_t * vector_bits) for _t in range(automaton.memory_length))
+
+
+def unpack_history(automaton, history, state):
+	"Inverse of `pack_history`, writing to the buffer `state`."
+	state = memoryview(state).cast('B')
+	length = automaton.symbol_bytes(automaton.memory_width)
+	vector_bits = automaton.memory_width * automaton.element_bits
+	for t in range(automaton.memory_length):
+		state[t * length:(t + 1) * length] = ((history >> (t * vector_bits)) & ((1 << vector_bits) - 1)).to_bytes(length, 'little')
+
+
+def linear_tables(columns):
+	"Byte lookup tables of the linear map over GF(2) given by the list of column bitmasks: `table[b][v]` is the image of `v << (8 * b)`."
+	tables = []
+	for b in range(0, len(columns), 8):
+		table = [0]
+		for k, column in enumerate(columns[b:b + 8]):
+			table.extend([_v ^ column for _v in table]) # entries for `v` with the bit `k` set follow the ones without it
+		table.extend([0] * (256 - len(table)))
+		tables.append(table)
+	return tables
+
+
+def linear_apply(columns, vector):
+	"Image of the bitmask `vector` under the linear map over GF(2) given by the list of column bitmasks."
+	result = 0
+	while vector:
+		low = vector & -vector
+		result ^= columns[low.bit_length() - 1]
+		vector ^= low
+	return result
+
+
+def linear_compose(first, second):
+	"Columns of the linear map `first` after `second`."
+	return [linear_apply(first, _column) for _column in second]
+
+
+def linear_power(columns, exponent):
+	"Columns of the linear map raised to the power `exponent`, by square-and-multiply."
+	result = [1 << _j for _j in range(len(columns))]
+	while exponent:
+		if exponent & 1:
+			result = linear_compose(columns, result)
+		columns = linear_compose(columns, columns)
+		exponent >>= 1
+	return result
+
+
+def linear_scan(arguments):
+	"""
+	Run the affine recurrence `y = Y z ^ y_const`, `h' = ((S z ^ s_const) | (h << state_width)) & history_mask`, with `z = h | (x << history_bits)`
+	over the list `symbols` starting from `history`. Returns (outputs, final history).
+	"""
+	
+	output_tables, state_tables, output_const, state_const, history_bits, state_width, history_mask, symbols, history = arguments
+	count = len(output_tables)
+	
+	outputs = []
+	for x in symbols:
+		z = history | (x << history_bits)
+		y = output_const
+		s = state_const
+		for b in range(count):
+			v = (z >> (8 * b)) & 0xff
+			y ^= output_tables[b][v]
+			s ^= state_tables[b][v]
+		outputs.append(y)
+		history = (s | (history << state_width)) & history_mask
+	return outputs, history
+
+
+class LinearAutomaton:
+	"""
+	Execution mode for automata over a ring of size 2 whose transition functions are affine. Stores the coefficients as column bitmasks
+	and processes long streams in parallel chunks (see `utils.parallel`): every chunk is run from the zero state, then the true states
+	at chunk boundaries are carried over with powers of the state matrix and the contribution of the carried state is added to the outputs.
+	Create with `Automaton.linearize()`.
+	"""
+	
+	def __init__(self, automaton, output_columns, state_columns, output_const, state_const):
+		self.automaton = automaton
+		self.input_width = automaton.input_width
+		self.output_size = automaton.output_size
+		self.memory_length = automaton.memory_length
+		self.memory_width = automaton.memory_width
+		self.history_bits = self.memory_length * self.memory_width
+		self.history_mask = (1 << self.history_bits) - 1
+		
+		self.output_columns = output_columns
+		self.state_columns = state_columns
+		self.output_const = output_const
+		self.state_const = state_const
+		
+		self.output_tables = linear_tables(output_columns)
+		self.state_tables = linear_tables(state_columns)
+		
+		# linear part of the history transition `h' = M h`
+		width = self.memory_width
+		self.history_columns = [(self.state_columns[_j] | ((1 << _j) << width)) & self.history_mask for _j in range(self.history_bits)]
+		self.history_power_cache = {}
+		self.affine_power_cache = {}
+		self.output_map_cache = {}
+	
+	def history_power(self, exponent):
+		try:
+			return self.history_power_cache[exponent]
+		except KeyError:
+			result = linear_power(self.history_columns, exponent)
+			self.history_power_cache[exponent] = result
+			return result
+	
+	def run(self, symbols, history=0, chunk_size=1 << 14):
+		"Process the list of input symbols (integers, element `i` at bit `i`) starting from the history (integer, see `pack_history`). Returns (outputs, final history)."
+		
+		chunks = [symbols[_n:_n + chunk_size] for _n in range(0, len(symbols), chunk_size)]
+		if not chunks:
+			return [], history
+		
+		results = list(parallel_map(linear_scan, [(self.output_tables, self.state_tables, self.output_const, self.state_const, self.history_bits, self.memory_width, self.history_mask, _chunk, 0) for _chunk in chunks]))
+		
+		out_bytes = self.automaton.symbol_bytes(self.output_size)
+		outputs = []
+		for chunk, (chunk_outputs, final) in zip(chunks, results):
+			if history:
+				correction = linear_apply(self.output_map(len(chunk)), history).to_bytes(len(chunk) * out_bytes, 'little')
+				if out_bytes == 1:
+					chunk_outputs = [_y ^ _c for (_y, _c) in zip(chunk_outputs, correction)]
+				else:
+					chunk_outputs = [_y ^ int.from_bytes(correction[_n * out_bytes:(_n + 1) * out_bytes], 'little') for (_n, _y) in enumerate(chunk_outputs)]
+			outputs.extend(chunk_outputs)
+			history = final ^ linear_apply(self.history_power(len(chunk)), history)
+		return outputs, history
+	
+	def output_map(self, length):
+		"""
+		The outputs of `length` steps under all-zero input as a linear function of the starting history (constants not applied), as columns:
+		output `t` at byte `t * symbol_bytes(output_size)`. Composed by halving the length, the second half applied to `history_power`, and cached.
+		"""
+		try:
+			return self.output_map_cache[length]
+		except KeyError:
+			pass
+		
+		if length <= 1:
+			result = list(self.output_columns[:self.history_bits]) if length else [0] * self.history_bits
+		else:
+			half = length // 2
+			first = self.output_map(half)
+			second = self.output_map(length - half)
+			shift = 8 * self.automaton.symbol_bytes(self.output_size) * half
+			result = [_f ^ (linear_apply(second, _h) << shift) for (_f, _h) in zip(first, self.history_power(half))]
+		
+		self.output_map_cache[length] = result
+		return result
+	
+	def affine_power(self, exponent):
+		"The history transition under all-zero input, applied `exponent` times, as a pair (columns, constant). Computed by square-and-multiply and cached."
+		try:
+			return self.affine_power_cache[exponent]
+		except KeyError:
+			pass
+		
+		def compose(first, second):
+			return linear_compose(first[0], second[0]), linear_apply(first[0], second[1]) ^ first[1]
+		
+		result = [1 << _j for _j in range(self.history_bits)], 0
+		step = self.history_columns, self.state_const & self.history_mask
+		n = exponent
+		while n:
+			if n & 1:
+				result = compose(step, result)
+			step = compose(step, step)
+			n >>= 1
+		
+		self.affine_power_cache[exponent] = result
+		return result
+	
+	@property
+	def nilpotency(self):
+		"The smallest `k` such that the state after `k` steps does not depend on the initial state, or `None` if there is no such `k`."
+		try:
+			return self.nilpotency_cache
+		except AttributeError:
+			pass
+		
+		if any(self.history_power(self.history_bits)):
+			result = None
+		else:
+			low, high = 0, self.history_bits # `history_power` is monotone: once zero, stays zero
+			while low < high:
+				middle = (low + high) // 2
+				if any(self.history_power(middle)):
+					low = middle + 1
+				else:
+					high = middle
+			result = low
+		
+		self.nilpotency_cache = result
+		return result
+	
+	def skip(self, state, k):
+		"Advance the packed state buffer (see `Automaton.packed_state_size`) in place by `k` steps of all-zero input symbols, in O(log k) matrix operations."
+		if memoryview(state).nbytes != self.automaton.packed_state_size:
+			raise ValueError("Invalid state buffer size")
+		columns, constant = self.affine_power(k)
+		unpack_history(self.automaton, linear_apply(columns, pack_history(self.automaton, state)) ^ constant, state)
+	
+	def symbols(self, data):
+		"Decode the packed input buffer to a list of integers."
+		in_bytes = self.automaton.symbol_bytes(self.input_width)
+		if not in_bytes:
+			raise ValueError("Automaton does not read any input")
+		data = memoryview(data).cast('B')
+		if len(data) % in_bytes:
+			raise ValueError("Buffer size is not a multiple of the symbol size")
+		
+		mask = (1 << self.input_width) - 1
+		if in_bytes == 1:
+			return [_x & mask for _x in data]
+		else:
+			return [int.from_bytes(data[_n:_n + in_bytes], 'little') & mask for _n in range(0, len(data), in_bytes)]
+	
+	def seek_history(self, symbols, offset, history=0, chunk_size=1 << 14):
+		"""
+		The history after the first `offset` symbols, starting from `history`. If the automaton forgets its initial state after `nilpotency` steps,
+		only the last `nilpotency` symbols before the offset are processed, otherwise the prefix is run in parallel chunks without keeping the outputs.
+		"""
+		depth = self.nilpotency
+		if depth is not None and offset >= depth:
+			return self.run(symbols[offset - depth:offset], 0, chunk_size)[1]
+		else:
+			return self.run(symbols[:offset], history, chunk_size)[1]
+	
+	def seek(self, data, offset, state, chunk_size=1 << 14):
+		"Set the packed state buffer (initially the state at the beginning of `data`) to the state after the first `offset` symbols of `data`."
+		if memoryview(state).nbytes != self.automaton.packed_state_size:
+			raise ValueError("Invalid state buffer size")
+		history = self.seek_history(self.symbols(data), offset, pack_history(self.automaton, state), chunk_size)
+		unpack_history(self.automaton, history, state)
+	
+	def stream(self, data, state=None, chunk_size=1 << 14, offset=0):
+		"""
+		Same as `Automaton.stream`, processing the input in parallel chunks of `chunk_size` symbols. With nonzero `offset` the outputs
+		start at the symbol `offset` of `data` and the state preceding it is obtained by `seek`. Ranges of one stream may be processed
+		independently this way.
+		"""
+		
+		automaton = self.automaton
+		out_bytes = automaton.symbol_bytes(self.output_size)
+		if state is not None and memoryview(state).nbytes != automaton.packed_state_size:
+			raise ValueError("Invalid state buffer size")
+		
+		symbols = self.symbols(data)
+		history = pack_history(automaton, state) if state is not None else 0
+		if offset:
+			history = self.seek_history(symbols, offset, history, chunk_size)
+			symbols = symbols[offset:]
+		
+		outputs, history = self.run(symbols, history, chunk_size)
+		
+		if state is not None:
+			unpack_history(automaton, history, state)
+		if out_bytes == 1:
+			return bytearray(outputs)
+		else:
+			return bytearray(b''.join(_y.to_bytes(out_bytes, 'little') for _y in outputs))
+	
+	def __call__(self, in_stream, initial_state=None, offset=0):
+		"""
+		Same as `Automaton.__call__`, the whole input processed at once by `stream`. Yields constant vectors.
+		With nonzero `offset` the first `offset` symbols only advance the state (see `seek`) and the outputs start at the next one.
+		"""
+		
+		automaton = self.automaton
+		state = bytearray(automaton.packed_state_size)
+		if initial_state is not None:
+			state[:] = automaton.pack_symbols(initial_state, self.memory_width)
+		data = automaton.pack_symbols(list(in_stream), self.input_width)
+		if offset:
+			self.seek(data, offset, state)
+			data = data[offset * automaton.symbol_bytes(self.input_width):]
+		yield from automaton.unpack_symbols(self.stream(data, state), self.output_size)
+
+
+class AutomatonChain:
+	"""
+	Lazy composition of automata. `AutomatonChain(a, b, c)` behaves as `a @ b @ c` (the input goes to `c` first), but the stages are evaluated
+	one after another without symbolic composition. Call `materialize()` to get the composed `Automaton`.
+	"""
+	
+	def __init__(self, *stages):
+		if not stages:
+			raise ValueError("Chain must have at least one stage.")
+		self.stages = []
+		for stage in stages:
+			try:
+				self.stages.extend(stage.stages)
+			except AttributeError:
+				self.stages.append(stage)
+	
+	def __matmul__(self, other):
+		return self.__class__(self, other)
+	
+	def __rmatmul__(self, other):
+		return self.__class__(other, self)
+	
+	def __len__(self):
+		return len(self.stages)
+	
+	def materialize(self):
+		"Symbolic composition of all the stages."
+		result = self.stages[-1]
+		for stage in reversed(self.stages[:-1]):
+			result = stage @ result
+		return result
+	
+	def optimize(self):
+		for stage in self.stages:
+			stage.optimize()
+	
+	@property
+	def input_width(self):
+		return self.stages[-1].input_width
+	
+	@property
+	def output_size(self):
+		return self.stages[0].output_size
+	
+	@property
+	def packed_state_size(self):
+		"List of the packed state sizes of all stages, see `Automaton.packed_state_size`."
+		return [_stage.packed_state_size for _stage in self.stages]
+	
+	def __call__(self, in_stream):
+		"Takes the stream of input symbols, yields the stream of output symbols, as `Automaton.__call__`."
+		for stage in reversed(self.stages):
+			in_stream = stage(in_stream)
+		yield from in_stream
+	
+	@staticmethod
+	def connect(data, source, target):
+		"Repack the output buffer of the stage `source` as the input of the stage `target` if their symbol formats differ."
+		if source.symbol_bytes(source.output_size) == target.symbol_bytes(target.input_width):
+			return data
+		width = target.input_width
+		zero = source.base_const_vector.zero(1)
+		vectors = source.unpack_symbols(data, source.output_size)
+		return target.pack_symbols((source.base_const_vector(list(_v)[:width] + list(zero) * (width - _v.dimension)) for _v in vectors), width)
+	
+	def run(self, functions, data, states):
+		if states is not None and len(states) != len(self.stages):
+			raise ValueError("Provide one state buffer per stage.")
+		source = None
+		for n in reversed(range(len(self.stages))):
+			if source is not None:
+				data = self.connect(data, source, self.stages[n])
+			data = functions[n](data, states[n] if states is not None else None)
+			source = self.stages[n]
+		return data
+	
+	def stream(self, data, states=None):
+		"Buffer interface as in `Automaton.stream`. `states` is the list of state buffers of all stages (see `packed_state_size`), updated in place."
+		return self.run([_stage.stream for _stage in self.stages], data, states)
+	
+	def compile(self, name, module):
+		for n, stage in enumerate(self.stages):
+			stage.compile(f'{name}_{n}', module)
+	
+	def wrap_compiled_stream(self, name, engine):
+		"Returns the function `fn(data, states=None)` running the compiled stream kernels of the stages one after another, see `stream`."
+		functions = [_stage.wrap_compiled_stream(f'{name}_{_n}', engine) for (_n, _stage) in enumerate(self.stages)]
+		def fn(data, states=None):
+			return self.run(functions, data, states)
+		fn.__name__ = name
+		return fn
+
+
+class AutomatonTable:
+	"""
+	Automaton tabulated by `Automaton.tabulate`. Both tables are indexed by the packed history (element of `s[t, i]` at bit `((t - 1) * memory_width + i) * element_bits`)
+	followed by the packed input symbol. `output_table` holds the packed output symbols and `state_table` the packed new state vectors.
+	"""
+	
+	def __init__(self, automaton, output_table, state_table):
+		self.automaton = automaton
+		self.output_table = output_table
+		self.state_table = state_table
+		self.element_bits = automaton.element_bits
+		self.input_width = automaton.input_width
+		self.output_size = automaton.output_size
+		self.memory_length = automaton.memory_length
+		self.memory_width = automaton.memory_width
+		self.history_bits = self.memory_length * self.memory_width * self.element_bits
+	
+	def stream(self, data, state=None):
+		"Same as `Automaton.stream`, by table lookup."
+		
+		import numpy
+		
+		in_bytes = self.automaton.symbol_bytes(self.input_width)
+		out_bytes = self.automaton.symbol_bytes(self.output_size)
+		if not in_bytes:
+			raise ValueError("Automaton does not read any input")
+		data = numpy.frombuffer(memoryview(data).cast('B'), dtype=numpy.uint8)
+		if len(data) % in_bytes:
+			raise ValueError("Buffer size is not a multiple of the symbol size")
+		if state is not None and memoryview(state).nbytes != self.automaton.packed_state_size:
+			raise ValueError("Invalid state buffer size")
+		
+		data = data.reshape(-1, in_bytes).astype(numpy.uint64)
+		symbols = numpy.zeros(len(data), dtype=numpy.uint64)
+		for b in range(in_bytes):
+			symbols |= data[:, b] << numpy.uint64(8 * b)
+		symbols &= numpy.uint64((1 << (self.input_width * self.element_bits)) - 1)
+		
+		if not self.memory_length:
+			output = self.output_table[symbols]
+		else:
+			history = pack_history(self.automaton, state) if state is not None else 0
+			shift = self.memory_width * self.element_bits
+			mask = (1 << self.history_bits) - 1
+			history_bits = self.history_bits
+			output_table = memoryview(self.output_table)
+			state_table = memoryview(self.state_table)
+			output = []
+			for x in symbols.tolist():
+				index = history | (x << history_bits)
+				output.append(output_table[index])
+				history = ((history << shift) | state_table[index]) & mask
+			output = numpy.array(output, dtype=numpy.uint64)
+			if state is not None:
+				unpack_history(self.automaton, history, state)
+		
+		return bytearray(numpy.ascontiguousarray(output.astype('<u8').view(numpy.uint8).reshape(-1, 8)[:, :out_bytes]).tobytes())
+	
+	def __call__(self, in_stream, initial_state=None):
+		"Same as `Automaton.__call__`, by table lookup. Yields constant vectors."
+		
+		state = bytearray(self.automaton.packed_state_size)
+		if initial_state is not None:
+			state[:] = self.automaton.pack_symbols(initial_state, self.memory_width)
+		for x in in_stream:
+			yield self.automaton.unpack_symbols(self.stream(self.automaton.pack_symbols([x], self.input_width), state), self.output_size)[0]
+
+
+class AutomatonSessionPool:
+	"""
+	Many concurrent sessions of one automaton. The states are kept packed (see `Automaton.packed_state_size`), one row per session, in a single contiguous buffer.
+	The input is processed by `kernel`, a function returned from `Automaton.wrap_compiled_stream`, reading and writing the session row in place.
+	Without `kernel` the interpreted `Automaton.stream` is used.
+	"""
+	
+	def __init__(self, automaton, kernel=None, capacity=16):
+		self.automaton = automaton
+		self.kernel = kernel if kernel is not None else automaton.stream
+		self.row_size = automaton.packed_state_size
+		self.states = bytearray(self.row_size * capacity)
+		self.free_rows = list(reversed(range(capacity)))
+		self.rows = {}
+		self.next_session = 0
+	
+	@property
+	def capacity(self):
+		return len(self.states) // self.row_size if self.row_size else len(self.rows) + len(self.free_rows)
+	
+	def __len__(self):
+		return len(self.rows)
+	
+	def __contains__(self, session):
+		return session in self.rows
+	
+	def row(self, session):
+		"Writable view of the packed state of the session. When `create` grows the pool, views taken before refer to the old buffer, no longer used."
+		row = self.rows[session]
+		return memoryview(self.states)[row * self.row_size:(row + 1) * self.row_size]
+	
+	def create(self, state=None):
+		"Open a new session starting from the packed `state` (zero state by default). Returns the session id."
+		
+		if state is not None and memoryview(state).nbytes != self.row_size:
+			raise ValueError("Invalid state buffer size")
+		
+		if not self.free_rows: # reallocate, resizing in place would fail while views from `row` are held
+			capacity = self.capacity
+			states = bytearray(len(self.states) + self.row_size * max(capacity, 1))
+			states[:len(self.states)] = self.states
+			self.states = states
+			self.free_rows.extend(reversed(range(capacity, 2 * max(capacity, 1))))
+		
+		session = self.next_session
+		self.next_session += 1
+		self.rows[session] = self.free_rows.pop()
+		
+		with self.row(session) as row:
+			row[:] = memoryview(state).cast('B') if state is not None else bytes(self.row_size)
+		return session
+	
+	def resume(self, session, data):
+		"Feed the packed input symbols to the session, returns the packed output. The session state is updated in place."
+		with self.row(session) as row:
+			return self.kernel(data, row)
+	
+	def state(self, session):
+		"Copy of the packed state of the session."
+		with self.row(session) as row:
+			return bytes(row)
+	
+	def drop(self, session):
+		"Close the session, its row is reused by the next `create`."
+		self.free_rows.append(self.rows.pop(session))
+
+
 if __debug__:
 	import pickle
 	from itertools import chain, tee
 	
+	try:
+		from jit_types import Compiler
+	except ImportError: # llvmlite not installed, only the interpreted tests will work
+		Compiler = None
+	
 	def test_automaton_composition(Ring, block_size, memblock_size, length):
 		print("Automaton composition test")
 		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length)
@@ -763,7 +1803,484 @@ if __debug__:
 				out2.append(a)
 			
 			assert out1 == out2
-
+	
+	def test_automaton_stream(Ring, block_size, memblock_size, length):
+		print("Automaton buffer stream test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length)
+		
+		Automaton = automaton_factory(Ring)
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 4):
+			print(" round", i)
+			automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			width = automaton.input_width
+			if not width: continue
+			
+			compiler = Compiler()
+			automaton.compile('a', compiler)
+			code = compiler.compile()
+			automaton_c = automaton.wrap_compiled_stream('a', code)
+			
+			text = [ConstVector.random(width) for _i in range(length)]
+			data = Automaton.pack_symbols(text, width)
+			assert Automaton.unpack_symbols(data, width) == text
+			
+			reference = Automaton.pack_symbols(automaton(text), automaton.output_size)
+			assert automaton.stream(data) == reference
+			
+			with code:
+				assert automaton_c(bytes(data)) == reference
+				
+				state_1 = bytearray(automaton.packed_state_size)
+				state_2 = bytearray(automaton.packed_state_size)
+				half = (length // 2) * Automaton.symbol_bytes(width)
+				assert automaton_c(data[:half], state_1) + automaton_c(data[half:], state_1) == reference
+				assert automaton.stream(data[:half], state_2) + automaton.stream(data[half:], state_2) == reference
+				assert state_1 == state_2
+			
+			with parallel(2):
+				compiler = Compiler()
+				automaton.compile('a', compiler)
+			code = compiler.compile()
+			with code:
+				assert automaton.wrap_compiled_stream('a', code)(data) == reference
+	
+	def test_automaton_snapshot(Ring, block_size, memblock_size, length):
+		print("Automaton state snapshot test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length)
+		
+		Automaton = automaton_factory(Ring)
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 4):
+			print(" round", i)
+			automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			width = automaton.input_width
+			if not width: continue
+			
+			compiler = Compiler()
+			automaton.compile('a', compiler)
+			code = compiler.compile()
+			
+			text = [ConstVector.random(width) for _i in range(length)]
+			half = length // 2
+			reference = list(automaton(text))
+			
+			history = automaton.load_state(automaton.save_state(bytes(automaton.packed_state_size)))
+			assert list(automaton(text[:half], history=history)) == reference[:half]
+			snapshot = automaton.save_state(history)
+			assert len(snapshot) == automaton.state_header.size + automaton.packed_state_size
+			assert list(automaton(text[half:], history=automaton.load_state(snapshot))) == reference[half:]
+			
+			packed = automaton.load_state(snapshot, form='packed')
+			assert automaton.save_state(packed) == snapshot
+			assert automaton.stream(Automaton.pack_symbols(text[half:], width), packed) == Automaton.pack_symbols(reference[half:], automaton.output_size)
+			
+			with code:
+				automaton_c = automaton.wrap_compiled('a', code)
+				state = automaton.load_state(snapshot, form='flat')
+				assert automaton.save_state(state) == snapshot
+				assert list(automaton_c(text[half:], state)) == reference[half:]
+				assert automaton.save_state(state) == automaton.save_state(packed)
+			
+			other = Automaton(automaton.output_transition + Vector([Automaton.base_polynomial.one()] * automaton.output_size), automaton.state_transition)
+			try:
+				other.load_state(snapshot)
+				assert False, "snapshot of a different automaton accepted"
+			except ValueError:
+				pass
+	
+	def test_automaton_export(Ring, block_size, memblock_size, length):
+		print("Automaton shared library export test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length)
+		
+		import subprocess, sys
+		from tempfile import TemporaryDirectory
+		from loader import Library
+		
+		Automaton = automaton_factory(Ring)
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 3):
+			print(" round", i)
+			automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			width = automaton.input_width
+			if not width: continue
+			
+			compiler = Compiler()
+			automaton.compile('a', compiler)
+			
+			text = [ConstVector.random(width) for _i in range(length)]
+			data = Automaton.pack_symbols(text, width)
+			state_1 = bytearray(automaton.packed_state_size)
+			reference = automaton.stream(data, state_1)
+			
+			with TemporaryDirectory() as directory:
+				path = Path(directory) / 'automaton.so'
+				compiler.export(path)
+				library = Library(path)
+				
+				stream = library.stream('a')
+				state_2 = bytearray(stream.state_size)
+				assert stream(data, state_2) == reference
+				assert state_1 == state_2
+				
+				step = library.step('a')
+				state_3 = bytearray(step.state_size)
+				in_bytes = Automaton.symbol_bytes(width)
+				assert b''.join(step(data[_n:_n + in_bytes], state_3) for _n in range(0, len(data), in_bytes)) == reference
+				assert state_1 == state_3
+				
+				script = f"import sys; from loader import Library; fn = Library({str(path)!r}).stream('a'); sys.stdout.buffer.write(fn(sys.stdin.buffer.read())); assert not {{'polynomial', 'linear', 'rings', 'llvmlite'}} & sys.modules.keys()"
+				assert subprocess.run([sys.executable, '-c', script], input=bytes(data), stdout=subprocess.PIPE, check=True, cwd=Path(__file__).parent).stdout == reference
+				assert subprocess.run([sys.executable, str(Path(__file__).parent / 'loader.py'), str(path), 'a'], input=bytes(data), stdout=subprocess.PIPE, check=True).stdout == reference
+	
+	def test_automaton_bitsliced(block_size, memblock_size, length, sessions):
+		print("Automaton bitsliced sessions test")
+		print(" data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length, ", sessions:", sessions)
+		
+		Automaton = automaton_factory(BooleanRing.get_algebra())
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 4):
+			print(" round", i)
+			automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			width = automaton.input_width
+			if not width: continue
+			
+			compiler = Compiler()
+			automaton.compile('a', compiler)
+			automaton.compile_bitsliced('a', compiler)
+			code = compiler.compile()
+			automaton_s = automaton.wrap_compiled_stream('a', code)
+			automaton_b = automaton.wrap_compiled_bitsliced('a', code)
+			
+			texts = [Automaton.pack_symbols([ConstVector.random(width) for _i in range(length)], width) for _k in range(sessions)]
+			states = [Automaton.pack_symbols([ConstVector.random(automaton.memory_width) for _i in range(automaton.memory_length)], automaton.memory_width) for _k in range(sessions)]
+			words = Automaton.bitslice_streams(texts, width)
+			assert Automaton.unbitslice_streams(words, width, sessions) == texts
+			
+			with code:
+				final_states = [bytearray(_state) for _state in states]
+				reference = [automaton_s(_text, _state) for (_text, _state) in zip(texts, final_states)]
+				
+				state_1 = Automaton.bitslice_streams(states, automaton.memory_width)
+				state_2 = Automaton.bitslice_streams(states, automaton.memory_width)
+				assert Automaton.unbitslice_streams(automaton.stream_bitsliced(words, state_1), automaton.output_size, sessions) == reference
+				assert Automaton.unbitslice_streams(automaton_b(words, state_2), automaton.output_size, sessions) == reference
+				assert state_1 == state_2
+				assert Automaton.unbitslice_streams(state_1, automaton.memory_width, sessions) == final_states
+	
+	def test_automaton_batch(Ring, block_size, memblock_size, length, sessions):
+		print("Automaton NumPy batch test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length, ", sessions:", sessions)
+		
+		import numpy
+		
+		Automaton = automaton_factory(Ring)
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 4):
+			print(" round", i)
+			automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			width = automaton.input_width
+			if not width: continue
+			
+			length_, width_ = automaton.memory_length, automaton.memory_width
+			texts = [[ConstVector.random(width) for _i in range(length)] for _k in range(sessions)]
+			states = [[ConstVector.random(width_) for _i in range(length_)] for _k in range(sessions)]
+			final_states = [deque(_state) for _state in states]
+			reference = [list(automaton(_text, history=_state)) for (_text, _state) in zip(texts, final_states)]
+			
+			if Ring.size == 2:
+				packed_texts = [Automaton.pack_symbols(_text, width) for _text in texts]
+				packed_states = [Automaton.pack_symbols(_state, width_) for _state in states]
+				inputs = numpy.array(Automaton.bitslice_streams(packed_texts, width), dtype=numpy.uint64).reshape(length, width, 1)
+				state = numpy.array(Automaton.bitslice_streams(packed_states, width_), dtype=numpy.uint64).reshape(length_ * width_, 1)
+				result = automaton.stream_batch(inputs, state)
+				assert Automaton.unbitslice_streams(array('Q', result.flatten().tolist()), automaton.output_size, sessions) == [Automaton.pack_symbols(_output, automaton.output_size) for _output in reference]
+				assert Automaton.unbitslice_streams(array('Q', state.flatten().tolist()), width_, sessions) == [Automaton.pack_symbols(_state, width_) for _state in final_states]
+			else:
+				inputs = numpy.array([[[int(_text[_n][_i]) for _text in texts] for _i in range(width)] for _n in range(length)], dtype=numpy.uint64)
+				state = numpy.array([[int(_state[_t][_i]) for _state in states] for _t in range(length_) for _i in range(width_)], dtype=numpy.uint64).reshape(length_ * width_, sessions)
+				result = automaton.stream_batch(inputs, state)
+				assert [[[int(_el) for _el in _y] for _y in _output] for _output in reference] == [[[int(result[_n, _i, _k]) for _i in range(automaton.output_size)] for _n in range(length)] for _k in range(sessions)]
+				assert [[[int(_el) for _el in _s] for _s in _state] for _state in final_states] == [[[int(state[_t * width_ + _i, _k]) for _i in range(width_)] for _t in range(length_)] for _k in range(sessions)]
+	
+	def test_session_pool(block_size, memblock_size, length, sessions):
+		print("Automaton session pool test")
+		print(" data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length, ", sessions:", sessions)
+		
+		Automaton = automaton_factory(BooleanRing.get_algebra())
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=2), Vector.random(dimension=memblock_size, variables=variables, order=2))
+		width = automaton.input_width
+		if not width: return
+		
+		compiler = Compiler()
+		automaton.compile('a', compiler)
+		code = compiler.compile()
+		
+		texts = [Automaton.pack_symbols([ConstVector.random(width) for _i in range(length)], width) for _k in range(sessions)]
+		reference = [automaton.stream(_text) for _text in texts]
+		half = (length // 2) * Automaton.symbol_bytes(width)
+		
+		with code:
+			for pool in AutomatonSessionPool(automaton, capacity=2), AutomatonSessionPool(automaton, automaton.wrap_compiled_stream('a', code), capacity=2):
+				view = pool.row(pool.create()) # held while the pool grows
+				ids = [pool.create() for _k in range(sessions)]
+				assert len(pool) == sessions + 1
+				view.release()
+				first = [pool.resume(_id, _text[:half]) for (_id, _text) in zip(ids, texts)]
+				
+				dropped = ids[0]
+				saved = pool.state(dropped)
+				pool.drop(dropped)
+				assert dropped not in pool
+				ids[0] = pool.create(saved)
+				
+				second = [pool.resume(_id, _text[half:]) for (_id, _text) in zip(ids, texts)]
+				assert [_a + _b for (_a, _b) in zip(first, second)] == reference
+	
+	def test_automaton_astream(block_size, memblock_size, length, chunk_size):
+		print("Automaton asyncio stream test")
+		print(" data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length, ", chunk size:", chunk_size)
+		
+		Automaton = automaton_factory(BooleanRing.get_algebra())
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=2), Vector.random(dimension=memblock_size, variables=variables, order=2))
+		width = automaton.input_width
+		if not width: return
+		
+		compiler = Compiler()
+		automaton.compile('a', compiler)
+		code = compiler.compile()
+		automaton_c = automaton.wrap_compiled_stream('a', code)
+		
+		text = Automaton.pack_symbols([ConstVector.random(width) for _i in range(length)], width)
+		reference_state = bytearray(automaton.packed_state_size)
+		reference = automaton.stream(text, reference_state)
+		
+		class Writer:
+			def __init__(self):
+				self.data = bytearray()
+				self.written = asyncio.Event()
+			
+			def write(self, data):
+				self.data += data
+				self.written.set()
+			
+			async def drain(self):
+				await asyncio.sleep(0)
+		
+		symbol_size = automaton.symbol_bytes(width)
+		output_size = len(reference) // length
+		
+		async def feed(reader, writer):
+			for n in range(0, len(text), 3): # fragments not aligned to symbols, arriving one by one
+				reader.feed_data(text[n:n + 3])
+				await asyncio.sleep(0)
+			reader.feed_eof()
+		
+		async def interact(reader, writer):
+			for n in range(0, len(text), symbol_size): # request, wait for the reply, only then the next request
+				reader.feed_data(text[n:n + symbol_size])
+				while len(writer.data) < (n // symbol_size + 1) * output_size:
+					writer.written.clear()
+					await asyncio.wait_for(writer.written.wait(), 10)
+			reader.feed_eof()
+		
+		async def run(stream, peer):
+			reader = asyncio.StreamReader()
+			writer = Writer()
+			peer_task = asyncio.create_task(peer(reader, writer))
+			state = await automaton.astream(reader, writer, stream=stream, chunk_size=chunk_size)
+			await peer_task
+			return writer.data, state
+		
+		with code:
+			for stream in None, automaton_c:
+				for peer in feed, interact:
+					output, state = asyncio.run(run(stream, peer))
+					assert output == reference
+					assert state == reference_state
+	
+	def test_automaton_tabulate(Ring, block_size, memblock_size, length):
+		print("Automaton tabulation test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length)
+		
+		Automaton = automaton_factory(Ring)
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 4):
+			print(" round", i)
+			automaton = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			width = automaton.input_width
+			if not width: continue
+			
+			table = automaton.tabulate()
+			text = [ConstVector.random(width) for _i in range(length)]
+			data = Automaton.pack_symbols(text, width)
+			
+			state_1 = bytearray(automaton.packed_state_size)
+			state_2 = bytearray(automaton.packed_state_size)
+			assert table.stream(data, state_1) == automaton.stream(data, state_2)
+			assert state_1 == state_2
+			assert list(table(text)) == list(automaton(text))
+		
+		print(" stateless automaton")
+		automaton = Automaton(Vector.random(dimension=block_size, variables=list(x), order=2))
+		if automaton.input_width:
+			text = [ConstVector.random(automaton.input_width) for _i in range(length)]
+			data = Automaton.pack_symbols(text, automaton.input_width)
+			assert automaton.tabulate().stream(data) == automaton.stream(data)
+	
+	def test_automaton_chain(Ring, block_size, memblock_size, length):
+		print("Automaton chain test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory block size:", memblock_size, ", stream length:", length)
+		
+		Automaton = automaton_factory(Ring)
+		Vector = Automaton.base_vector
+		ConstVector = Automaton.base_const_vector
+		
+		x = Vector([Automaton.x[_i] for _i in range(block_size)])
+		s_1 = Vector([Automaton.s[1, _i] for _i in range(memblock_size)])
+		s_2 = Vector([Automaton.s[2, _i] for _i in range(memblock_size)])
+		
+		variables = list(x) + list(s_1) + list(s_2)
+		
+		for i in range(1, 3):
+			print(" round", i)
+			automaton1 = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			automaton2 = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			automaton3 = Automaton(Vector.random(dimension=block_size, variables=variables, order=i), Vector.random(dimension=memblock_size, variables=variables, order=i))
+			
+			chain = AutomatonChain(automaton1, automaton2) @ automaton3
+			assert len(chain) == 3
+			composed = chain.materialize()
+			
+			text = [ConstVector.random(block_size) for _i in range(length)]
+			assert list(chain(text)) == list(automaton1(automaton2(automaton3(text))))
+			
+			compiler = Compiler()
+			chain.compile('c', compiler)
+			code = compiler.compile()
+			chain_c = chain.wrap_compiled_stream('c', code)
+			
+			width = chain.input_width
+			if not width or Automaton.symbol_bytes(width) != Automaton.symbol_bytes(block_size): continue
+			data = Automaton.pack_symbols(text, block_size) # elements beyond `width` are ignored
+			reference = Automaton.pack_symbols(composed(text), chain.output_size)
+			states_1 = [bytearray(_size) for _size in chain.packed_state_size]
+			states_2 = [bytearray(_size) for _size in chain.packed_state_size]
+			assert chain.stream(data, states_1) == reference
+			with code:
+				assert chain_c(data, states_2) == reference
+			assert states_1 == states_2
+	
+	def test_linear_automaton(Ring, block_size, memory_size, length):
+		print("Linear automaton test")
+		print(" algebra:", Ring, ", data block size:", block_size, ", memory size:", memory_size, ", stream length:", length)
+		
+		Automaton = automaton_factory(Ring)
+		ConstVector = Automaton.base_const_vector
+		
+		for pair in (Automaton.linear_nodelay_wifa_pair, Automaton.linear_delay_wifa_pair):
+			print(" pair", pair.__name__)
+			automaton_A, automaton_B = pair(block_size=block_size, memory_size=memory_size)
+			for automaton in (automaton_A, automaton_B):
+				assert automaton.is_linear()
+				linear = automaton.linearize()
+				
+				text = [ConstVector.random(automaton.input_width) for _i in range(length)]
+				data = Automaton.pack_symbols(text, automaton.input_width)
+				state_1 = bytearray(automaton.packed_state_size)
+				state_2 = bytearray(automaton.packed_state_size)
+				state_3 = bytearray(automaton.packed_state_size)
+				reference = automaton.stream(data, state_1)
+				assert linear.stream(data, state_2, chunk_size=length // 3 + 1) == reference
+				assert state_1 == state_2
+				with parallel(2):
+					assert linear.stream(data, state_3, chunk_size=length // 4 + 1) == reference
+				assert state_1 == state_3
+				
+				assert linear.stream(data, state_2) == automaton.stream(data, state_1)
+				assert state_1 == state_2
+				
+				in_bytes = Automaton.symbol_bytes(automaton.input_width)
+				for k in (0, 1, 5, 37):
+					linear.skip(state_2, k)
+					automaton.stream(bytes(k * in_bytes), state_1)
+					assert state_1 == state_2
+				
+				out_bytes = Automaton.symbol_bytes(automaton.output_size)
+				vectors_reference = Automaton.pack_symbols(automaton(text), automaton.output_size)
+				for offset in (0, 1, 2 * memory_size + 1, length // 2):
+					state_1[:] = state_3
+					state_2[:] = state_3
+					reference = automaton.stream(data, state_1)[offset * out_bytes:]
+					assert linear.stream(data, state_2, offset=offset) == reference
+					assert state_1 == state_2
+					assert Automaton.pack_symbols(linear(text, offset=offset), automaton.output_size) == vectors_reference[offset * out_bytes:]
 	
 	def test_state_mixing(Ring, block_size, memblock_size, length):
 		print("State mixing test")
@@ -873,11 +2390,6 @@ if __debug__:
 			start_time = time()
 			compiler = Compiler()
 			
-			#try:
-			#	Ring.compile_tables('RijndaelField', compiler)
-			#except AttributeError:
-			#	pass
-			
 			with parallel(0):
 				mixer.compile('m', compiler)
 				unmixer.compile('u', compiler)
@@ -969,6 +2481,33 @@ if __debug__:
 			print(" ok", memory_size)
 		'''
 		
+		if verbose: print()
+		test_automaton_tabulate(BooleanRing.get_algebra(), 8, 4, 256)
+		test_linear_automaton(BooleanRing.get_algebra(), 8, 4, 1000)
+		
+		try:
+			import numpy
+		except ImportError:
+			pass
+		else:
+			test_automaton_batch(BooleanRing.get_algebra(), 8, 4, 64, 64)
+			test_automaton_batch(ModularRing.get_algebra(size=251), 4, 2, 32, 16)
+		
+		if Compiler is not None: # compiled kernels need llvmlite
+			test_automaton_stream(BooleanRing.get_algebra(), 8, 4, 256)
+			test_automaton_stream(RijndaelField.get_algebra(), 4, 2, 64)
+			test_automaton_stream(ModularRing.get_algebra(size=2**64), 4, 2, 64)
+			test_automaton_stream(ModularRing.get_algebra(size=2**61 - 1), 4, 2, 64)
+			test_automaton_snapshot(BooleanRing.get_algebra(), 8, 4, 256)
+			test_automaton_snapshot(RijndaelField.get_algebra(), 4, 2, 64)
+			test_automaton_export(BooleanRing.get_algebra(), 8, 4, 256)
+			test_automaton_export(RijndaelField.get_algebra(), 4, 2, 64)
+			test_automaton_export(ModularRing.get_algebra(size=2**128), 4, 2, 64)
+			test_automaton_bitsliced(8, 4, 64, 64)
+			test_session_pool(8, 4, 64, 16)
+			test_automaton_astream(8, 4, 256, 16)
+			test_automaton_chain(BooleanRing.get_algebra(), 8, 4, 256)
+		
 		print()
 		print("Testing FAPKC0")
 		for memory_size in range(1, 5):
@@ -1055,7 +2594,7 @@ if __debug__:
 		if verbose: print(" automaton test")
 		test_automaton_composition(field)
 		
-	__all__ = __all__ + ('test_automaton_composition', 'test_fapkc_encryption', 'test_homomorphic_encryption', 'automaton_test_suite',)
+	__all__ = __all__ + ('test_automaton_composition', 'test_automaton_stream', 'test_automaton_snapshot', 'test_automaton_export', 'test_automaton_bitsliced', 'test_automaton_batch', 'test_session_pool', 'test_automaton_astream', 'test_automaton_tabulate', 'test_automaton_chain', 'test_linear_automaton', 'test_fapkc_encryption', 'test_homomorphic_encryption', 'automaton_test_suite',)
 
 
 
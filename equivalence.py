@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+#-*- coding:utf8 -*-
+
+"Combinational equivalence checking of polynomial vectors: random simulation for counterexamples, then an exact proof within a budget."
+
+from time import time
+from collections import Counter
+from utils import randbelow
+
+try:
+	import numpy
+	from vectorized import Program
+except ImportError:
+	numpy = None
+
+
+__all__ = 'Equivalence', 'check_equivalence'
+
+
+methods = 'identical', 'exhaustive', 'canonical', 'simulation' # from the strongest proof to the weakest
+
+
+class Equivalence:
+	"""
+	Result of `check_equivalence`. `equal` is `True` if every component has been proven equal, `False` if a counterexample was found
+	(`component` is the differing index and `counterexample` the valuation `{variable name: ring element}`, if known), `None` if some components passed
+	the random simulation only. `method` is the weakest method used, `methods` counts the components per method, `time` is in seconds.
+	"""
+	
+	def __init__(self, equal, method, methods, time, counterexample=None, component=None):
+		self.equal = equal
+		self.method = method
+		self.methods = methods
+		self.time = time
+		self.counterexample = counterexample
+		self.component = component
+	
+	def __bool__(self):
+		return self.equal is not False
+	
+	def __str__(self):
+		if self.equal is False:
+			where = f" at {', '.join(_k + '=' + str(_v) for (_k, _v) in sorted(self.counterexample.items()))}" if self.counterexample else ""
+			return f"different in component {self.component}{where} ({self.method}, {self.time:.3f}s)"
+		return f"{'equal' if self.equal else 'probably equal'} ({', '.join(_m + ':' + str(self.methods[_m]) for _m in methods if self.methods[_m])}, {self.time:.3f}s)"
+
+
+def simulation_supported(ring):
+	"Whether NumPy programs (see `vectorized.Program`) can evaluate polynomials over `ring`."
+	return numpy is not None and (ring.size == 2 or (ring.algebra_name == 'ModularRing' and ring.size <= (1 << 32)))
+
+
+def jit_available():
+	"Whether compiled search kernels (see `Polynomial.search_probe`) can be used, i.e. llvmlite is installed."
+	try:
+		import jit_types
+	except ImportError:
+		return False
+	return True
+
+
+def random_valuations(ring, count, words):
+	"Array of `count` rows of random values, bitsliced `uint64` words over a ring of size 2."
+	generator = numpy.random.default_rng(randbelow(1 << 64))
+	if ring.size == 2:
+		return generator.integers(0, 1 << 64, size=(count, words), dtype=numpy.uint64, endpoint=False)
+	else:
+		return generator.integers(0, ring.size, size=(count, words), dtype=numpy.uint64)
+
+
+def exhaustive_valuations(ring, count, chunk):
+	"Yield arrays of `count` rows enumerating all valuations of `count` variables, at most `chunk` columns at once."
+	if ring.size == 2:
+		patterns = [sum(1 << _k for _k in range(64) if (_k >> _i) & 1) for _i in range(6)]
+		words = 1 << max(count - 6, 0)
+		for start in range(0, words, chunk):
+			index = numpy.arange(start, min(start + chunk, words), dtype=numpy.uint64)
+			values = numpy.empty((count, len(index)), dtype=numpy.uint64)
+			for i in range(count):
+				if i < 6:
+					values[i] = patterns[i]
+				else:
+					values[i] = numpy.uint64(0) - ((index >> numpy.uint64(i - 6)) & numpy.uint64(1))
+			yield values
+	else:
+		total = ring.size ** count
+		for start in range(0, total, chunk):
+			index = numpy.arange(start, min(start + chunk, total), dtype=numpy.uint64)
+			values = numpy.empty((count, len(index)), dtype=numpy.uint64)
+			for i in range(count):
+				values[i] = (index // numpy.uint64(ring.size ** i)) % numpy.uint64(ring.size)
+			yield values
+
+
+def find_difference(ring, names, values, first, second):
+	"Locate a column where the result rows differ. Returns the valuation `{name: ring element}` or `None`."
+	differences = numpy.nonzero(first != second)[0]
+	if not len(differences):
+		return None
+	column = differences[0]
+	if ring.size == 2:
+		bit = (int(first[column]) ^ int(second[column])).bit_length() - 1
+		return dict((_name, ring((int(values[_n, column]) >> bit) & 1)) for (_n, _name) in enumerate(names))
+	else:
+		return dict((_name, ring(int(values[_n, column]))) for (_n, _name) in enumerate(names))
+
+
+def check_equivalence(first, second, rounds=16, words=1024, budget=1 << 22, canonical_limit=256, time_limit=10):
+	"""
+	Check that the polynomial vectors (or polynomials) `first` and `second` are equal as functions, see `Equivalence`.
+	First both are simulated together on `rounds` batches of random valuations (64 per bitsliced word over a ring of size 2, 1024 words per batch);
+	then the differing components are proven equal, exhaustively if they depend on at most `budget` valuations (in compiled code if NumPy can not simulate
+	the ring, when llvmlite is available), or by comparing canonical forms if both have at most `canonical_limit` gates (`None` for no limit, the cost is exponential).
+	No proofs are started after `time_limit` seconds (`None` for no limit); the components left unproven are reported as checked by `'simulation'`.
+	"""
+	
+	start = time()
+	
+	try:
+		first = list(first)
+		second = list(second)
+	except TypeError:
+		first = [first]
+		second = [second]
+	if len(first) != len(second):
+		raise ValueError("Compared vectors must be of the same length.")
+	
+	methods_count = Counter()
+	
+	pending = []
+	for n, (a, b) in enumerate(zip(first, second)):
+		if a is b:
+			methods_count['identical'] += 1
+		else:
+			pending.append(n)
+	
+	if not pending:
+		return Equivalence(True, 'identical', methods_count, time() - start)
+	
+	ring = first[pending[0]].algebra.base_ring
+	
+	names = sorted(frozenset().union(*[frozenset(str(_v) for _v in first[_n].variables() | second[_n].variables()) for _n in pending]))
+	slots = dict((_name, _n) for (_n, _name) in enumerate(names))
+	
+	pending_first = [first[_n] for _n in pending]
+	pending_second = [second[_n] for _n in pending]
+	
+	if ring.size ** len(names) <= budget and simulation_supported(ring): # all components at once, exhaustively
+		program = Program(pending_first + pending_second, slots)
+		for values in exhaustive_valuations(ring, len(names), 1 << 14):
+			result = program(values)
+			for k, n in enumerate(pending):
+				counterexample = find_difference(ring, names, values, result[k], result[k + len(pending)])
+				if counterexample is not None:
+					return Equivalence(False, 'exhaustive', Counter(exhaustive=1), time() - start, counterexample, n)
+		methods_count['exhaustive'] += len(pending)
+		return Equivalence(True, [_m for _m in methods if methods_count[_m]][-1], methods_count, time() - start)
+	
+	# random simulation
+	if simulation_supported(ring):
+		program = Program(pending_first + pending_second, slots)
+		for r in range(rounds):
+			values = random_valuations(ring, len(names), words)
+			result = program(values)
+			for k, n in enumerate(pending):
+				counterexample = find_difference(ring, names, values, result[k], result[k + len(pending)])
+				if counterexample is not None:
+					return Equivalence(False, 'simulation', Counter(simulation=1), time() - start, counterexample, n)
+	else:
+		for r in range(rounds):
+			values = [ring.random() for _name in names]
+			for n in pending:
+				if first[n].evaluate_slots(slots, values) != second[n].evaluate_slots(slots, values):
+					return Equivalence(False, 'simulation', Counter(simulation=1), time() - start, dict(zip(names, values)), n)
+	
+	# exact proofs, component by component
+	for n in pending:
+		a, b = first[n], second[n]
+		component_names = sorted(str(_v) for _v in a.variables() | b.variables())
+		
+		if time_limit is not None and time() - start > time_limit:
+			methods_count['simulation'] += 1
+		elif ring.size ** len(component_names) <= budget and simulation_supported(ring):
+			component_slots = dict((_name, _n) for (_n, _name) in enumerate(component_names))
+			program = Program([a, b], component_slots)
+			for values in exhaustive_valuations(ring, len(component_names), 1 << 14):
+				result = program(values)
+				counterexample = find_difference(ring, component_names, values, result[0], result[1])
+				if counterexample is not None:
+					return Equivalence(False, 'exhaustive', Counter(exhaustive=1), time() - start, counterexample, n)
+			methods_count['exhaustive'] += 1
+		elif ring.size ** len(component_names) <= budget and ring.size <= 1 << 64 and jit_available():
+			if (a - b).search_probe()(ring.size ** len(component_names), 0, 0):
+				return Equivalence(False, 'exhaustive', Counter(exhaustive=1), time() - start, None, n)
+			methods_count['exhaustive'] += 1
+		elif canonical_limit is None or (a.circuit_size() <= canonical_limit and b.circuit_size() <= canonical_limit):
+			if a != b:
+				return Equivalence(False, 'canonical', Counter(canonical=1), time() - start, {}, n)
+			methods_count['canonical'] += 1
+		else:
+			methods_count['simulation'] += 1
+	
+	method = [_m for _m in methods if methods_count[_m]][-1]
+	return Equivalence(True if method != 'simulation' else None, method, methods_count, time() - start)
+
+
+if __debug__:
+	from rings import *
+	from polynomial import *
+	from linear import *
+	
+	def test_equivalence(Ring, dimension, variables_count, order):
+		"Check random vectors against rewritten copies and detect a single modified component."
+		
+		print("Equivalence checker test")
+		print(" algebra:", Ring, ", dimension:", dimension, ", variables:", variables_count, ", order:", order)
+		
+		Polynomial_ = Polynomial.get_algebra(base_ring=Ring)
+		Vector_ = Vector.get_algebra(base_ring=Polynomial_)
+		variables = [Polynomial_.var(f'v_{_n}') for _n in range(variables_count)]
+		
+		vector = Vector_.random(dimension=dimension, variables=variables, order=order)
+		rewritten = Vector_([(_component + variables[0]) - variables[0] for _component in vector])
+		result = check_equivalence(vector, rewritten)
+		assert result, str(result)
+		assert check_equivalence(vector, vector).method == 'identical'
+		print("", result)
+		
+		modified = Vector_(list(rewritten))
+		modified[dimension // 2] = modified[dimension // 2] + variables[0] * variables[1] * variables[2]
+		result = check_equivalence(vector, modified)
+		assert result.equal is False and result.component == dimension // 2, str(result)
+		slots = dict((str(_v), _n) for (_n, _v) in enumerate(variables))
+		values = [result.counterexample.get(str(_v), Ring.zero()) for _v in variables]
+		assert vector.evaluate_slots(slots, values) != modified.evaluate_slots(slots, values)
+		print("", result)
+		
+		small = Vector_([variables[0] * variables[1] + variables[2], variables[0] - variables[1]])
+		swapped = Vector_([variables[2] + variables[1] * variables[0], -variables[1] + variables[0]])
+		result = check_equivalence(small, swapped, budget=1)
+		assert result.equal is True and result.method == 'canonical', str(result)
+		result = check_equivalence(small, swapped, budget=1, canonical_limit=0)
+		assert result.equal is None and result.method == 'simulation', str(result)
+		result = check_equivalence(small, swapped, budget=1, time_limit=0)
+		assert result.equal is None and result.method == 'simulation', str(result)
+	
+	__all__ = __all__ + ('test_equivalence',)
+
+
+if __debug__ and __name__ == '__main__':
+	test_equivalence(BooleanRing.get_algebra(), 8, 10, 3)
+	test_equivalence(BooleanRing.get_algebra(), 4, 30, 2)
+	test_equivalence(ModularRing.get_algebra(size=5), 4, 6, 2)
+	test_equivalence(BinaryField.get_algebra(exponent=4, reducing_polynomial=(1, 0, 0, 1, 1)), 3, 4, 2)
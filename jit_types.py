@@ -6,13 +6,45 @@ import llvmlite.ir
 import llvmlite.binding
 from llvmlite.ir._utils import DuplicatedNameError
 import ctypes
+import os
+from pathlib import Path
+from hashlib import sha256
+from threading import Thread, RLock
+from time import time
+from tempfile import TemporaryDirectory
+import subprocess
+from itertools import chain
+import utils
 
 
-__all__ = 'Compiler', 'Code', 'Function', 'Integer', 'Array'
+__all__ = 'Compiler', 'Code', 'TieredCode', 'EngineManager', 'engine_manager', 'Function', 'Integer', 'Array', 'Frame', 'object_cache'
 
 
 compiler_initialized = False
 
+object_cache_directory = os.environ.get('JIT_OBJECT_CACHE', None) # directory of the persistent cache of compiled machine code, see `Code`
+
+optimization_level = 3
+
+compile_lock = RLock() # LLVM context is shared, compile one module set at a time
+
+
+class object_cache:
+	"Context manager setting the directory of the persistent object cache used by `Code` (`None` disables the cache)."
+	
+	def __init__(self, directory):
+		self.new_directory = directory
+	
+	def __enter__(self):
+		global object_cache_directory
+		self.old_directory = object_cache_directory
+		object_cache_directory = self.new_directory
+		return self
+	
+	def __exit__(self, *args):
+		global object_cache_directory
+		object_cache_directory = self.old_directory
+
 
 def initialize_compiler():
 	global compiler_initialized
@@ -37,30 +69,326 @@ def typeconv(lltype):
 		return ctypes.c_ubyte
 	elif lltype == llvmlite.ir.IntType(16):
 		return ctypes.c_ushort
+	elif lltype == llvmlite.ir.IntType(32):
+		return ctypes.c_uint
+	elif lltype == llvmlite.ir.IntType(64):
+		return ctypes.c_ulonglong
+	elif lltype == llvmlite.ir.VoidType():
+		return None
+	elif isinstance(lltype, llvmlite.ir.PointerType):
+		return ctypes.c_void_p
 	else:
 		raise ValueError(str(lltype))
 
 
+wide_suffix = '.wide' # entry points of the functions ctypes can not call directly, see `Compiler.declare_wide_entries`
+
+
+def is_wide(function_type):
+	"Whether the function type has integers wider than 64 bits, not representable in ctypes."
+	return any(isinstance(_type, llvmlite.ir.IntType) and _type.width > 64 for _type in (function_type.return_type,) + tuple(function_type.args))
+
+
+def wide_caller(function_type, address):
+	"Python callable taking and returning ints, calling the entry point `void (i8 *arguments, i8 *result)` at `address` (see `Compiler.declare_wide_entries`)."
+	entry = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_void_p)(address)
+	sizes = [(_arg.width + 7) // 8 for _arg in function_type.args]
+	result_size = (function_type.return_type.width + 7) // 8 if isinstance(function_type.return_type, llvmlite.ir.IntType) else 0
+	
+	def call(*args):
+		if len(args) != len(sizes):
+			raise TypeError(f"Expected {len(sizes)} arguments, got {len(args)}.")
+		arguments = ctypes.create_string_buffer(b''.join((int(_arg) % (1 << (8 * _size))).to_bytes(_size, 'little') for (_arg, _size) in zip(args, sizes)), max(sum(sizes), 1))
+		result = ctypes.create_string_buffer(max(result_size, 1))
+		entry(arguments, result)
+		return int.from_bytes(result.raw[:result_size], 'little') if result_size else None
+	call.entry = entry
+	return call
+
+
+def object_key(ir, triple, opt_level):
+	"Name of the cached object file compiled from the IR text."
+	return sha256('\0'.join([ir, triple, str(opt_level), '.'.join(map(str, llvmlite.binding.llvm_version_info))]).encode()).hexdigest()
+
+
+def compile_object(ir, opt_level, cache_directory=None):
+	"Optimize the IR text and generate a native object file, returned as `bytes`. Uses the same persistent cache as `Code`."
+	
+	if not compiler_initialized:
+		initialize_compiler()
+	target_machine = llvmlite.binding.Target.from_default_triple().create_target_machine(reloc='pic') # loadable by MCJIT and linkable to a shared library
+	
+	if cache_directory is not None:
+		path = Path(cache_directory).expanduser() / (object_key(ir, target_machine.triple + '-pic', opt_level) + '.o')
+		try:
+			return path.read_bytes()
+		except FileNotFoundError:
+			pass
+	
+	ll_module = llvmlite.binding.parse_assembly(ir)
+	pmb = llvmlite.binding.PassManagerBuilder()
+	pmb.opt_level = opt_level
+	pm = llvmlite.binding.ModulePassManager()
+	pmb.populate(pm)
+	pm.run(ll_module)
+	result = target_machine.emit_object(ll_module)
+	
+	if cache_directory is not None:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		temporary = path.with_suffix('.tmp' + str(os.getpid()))
+		temporary.write_bytes(result)
+		os.replace(temporary, path)
+	return result
+
+
+def compile_group(arguments):
+	"Process pool worker of `Compiler.compile_parallel`. Returns the object file and the signatures `(name, bits, arg_count)` of the defined functions."
+	items, opt_level, cache_directory, profile = arguments
+	compiler = Compiler(profile=profile)
+	for name, item in items:
+		item.compile(name, compiler)
+	signatures = [(_function.name, _function.function_type.return_type.width, len(_function.function_type.args)) for _function in compiler.module.functions if not _function.is_declaration and _function.linkage != 'internal']
+	return compile_object(str(compiler.module), opt_level, cache_directory), signatures
+
+
+class EngineGeneration:
+	"One MCJIT engine of `EngineManager`. Code memory of MCJIT is released only with the whole engine."
+	
+	def __init__(self):
+		target_machine = llvmlite.binding.Target.from_default_triple().create_target_machine()
+		self.engine = llvmlite.binding.create_mcjit_compiler(llvmlite.binding.parse_assembly(""), target_machine)
+		self.engine.set_object_cache(self.object_compiled)
+		self.sizes = {} # module name -> object size
+		self.live = set()
+		self.dead_size = 0
+	
+	def object_compiled(self, module, buffer):
+		if module.name.startswith('shared_'): # not the empty backing module
+			self.sizes[module.name] = len(buffer)
+
+
+class EngineManager:
+	"""
+	Process-wide JIT engine shared by `Code` objects created with `shared=True` (see `engine_manager`). Modules are added to the current engine
+	with their symbols renamed to unique names, and removed by `Code.release`. Once the removed code in the current engine exceeds `retire_size` bytes,
+	new modules go to a fresh engine and the old one is freed when its last module is released. `code_size` is the resident size of the compiled code.
+	"""
+	
+	retire_size = 1 << 24
+	
+	def __init__(self):
+		if not compiler_initialized:
+			initialize_compiler()
+		self.generations = [EngineGeneration()]
+		self.pass_managers = {}
+		self.counter = 0
+	
+	def pass_manager(self, opt_level):
+		try:
+			return self.pass_managers[opt_level]
+		except KeyError:
+			pmb = llvmlite.binding.PassManagerBuilder()
+			pmb.opt_level = opt_level
+			pm = llvmlite.binding.ModulePassManager()
+			pmb.populate(pm)
+			self.pass_managers[opt_level] = pm
+			return pm
+	
+	def add(self, modules, opt_level):
+		"Compile the IR modules into the current engine. Returns the engine generation, the binding modules and the map of original to unique symbol names."
+		generation = self.generations[-1]
+		self.counter += 1
+		uid = self.counter
+		
+		ll_modules = []
+		names = {}
+		for n, module in enumerate(modules):
+			ll_module = llvmlite.binding.parse_assembly(str(module))
+			ll_module.name = f'shared_{uid}_{n}'
+			for value in chain(ll_module.functions, ll_module.global_variables):
+				if not value.is_declaration:
+					names[value.name] = value.name + '.' + str(uid)
+					value.name = names[value.name]
+			ll_modules.append(ll_module)
+		
+		for ll_module in ll_modules:
+			for value in chain(ll_module.functions, ll_module.global_variables): # references between the modules of one `Code`
+				if value.is_declaration and value.name in names:
+					value.name = names[value.name]
+			self.pass_manager(opt_level).run(ll_module)
+			generation.engine.add_module(ll_module)
+			generation.live.add(ll_module.name)
+		generation.engine.finalize_object()
+		return generation, ll_modules, names
+	
+	def remove(self, generation, ll_modules):
+		"Remove the modules, freeing the engine if it has been retired and holds no more modules."
+		for ll_module in ll_modules:
+			generation.engine.remove_module(ll_module)
+			generation.live.discard(ll_module.name)
+			generation.dead_size += generation.sizes.get(ll_module.name, 0)
+		
+		if generation is self.generations[-1]:
+			if generation.dead_size > self.retire_size:
+				self.generations.append(EngineGeneration())
+		if generation is not self.generations[-1] and not generation.live:
+			self.generations.remove(generation)
+	
+	@property
+	def code_size(self):
+		"Resident size of compiled code in bytes, including removed modules of engines not yet freed."
+		return sum(sum(_generation.sizes.values()) for _generation in self.generations)
+	
+	@property
+	def live_code_size(self):
+		"Size of compiled code of the modules not removed."
+		return sum(_generation.sizes.get(_name, 0) for _generation in self.generations for _name in _generation.live)
+
+
+shared_engine_manager = None
+
+
+def engine_manager():
+	"The process-wide `EngineManager`, created on first use."
+	global shared_engine_manager
+	if shared_engine_manager is None:
+		shared_engine_manager = EngineManager()
+	return shared_engine_manager
+
+
+search_kernels = {} # (arg_count, bits, ring_size) -> (code, function)
+
+
+def search_kernel(arg_count, bits, ring_size):
+	"""
+	The kernel of `Compiler.declare_search_function`, compiled once per signature into the shared engine.
+	Called as `kernel(address, count, seed, target)` with the address of the compiled function to test.
+	"""
+	key = arg_count, bits, ring_size
+	with compile_lock:
+		try:
+			return search_kernels[key][1]
+		except KeyError:
+			pass
+		compiler = Compiler()
+		compiler.declare_search_function('search', arg_count, bits, ring_size)
+		code = compiler.compile(shared=True)
+		search_kernels[key] = code, code.symbol['search']
+		return code.symbol['search']
+
+
 class Code:
-	def __init__(self, modules):
+	"""
+	Machine code compiled from the IR modules. If `cache_directory` (by default `object_cache_directory`, see `object_cache`) is set,
+	object files are stored there keyed by the hash of the IR text, target triple and optimization level, and unchanged modules
+	are loaded without optimization and code generation. With `shared=True` the code is added to the process-wide engine
+	(see `EngineManager`, the disk cache is not used) and should be freed by `release`. With `private_context=True` the modules are compiled
+	in an LLVM context of their own, without holding `compile_lock`, so that long compilations (see `TieredCode`) do not block the others.
+	"""
+	
+	def __init__(self, modules, cache_directory=None, opt_level=None, objects=(), shared=False, private_context=False):
+		opt_level = optimization_level if opt_level is None else opt_level
+		if private_context and not shared:
+			if not compiler_initialized:
+				with compile_lock:
+					initialize_compiler()
+			self.context = llvmlite.binding.create_context()
+			self.compile(modules, cache_directory, opt_level, objects)
+			return
+		
+		self.context = None
+		with compile_lock:
+			if shared and not objects:
+				self.compile_shared(modules, opt_level)
+			else:
+				self.compile(modules, cache_directory, opt_level, objects)
+	
+	def compile_shared(self, modules, opt_level):
+		start = time()
+		self.opt_level = opt_level
+		self.cache_directory = None
+		
+		self.generation, self.modules, names = engine_manager().add(modules, opt_level)
+		self.engine = self.generation.engine
+		
+		self.symbol = {}
+		for module in modules:
+			for function in module.functions:
+				fname = function.name
+				ftype = function.function_type
+				if is_wide(ftype):
+					if fname + wide_suffix in module.globals:
+						self.symbol[fname] = wide_caller(ftype, self.engine.get_function_address(names.get(fname + wide_suffix, fname + wide_suffix)))
+					continue
+				faddr = self.engine.get_function_address(names.get(fname, fname))
+				self.symbol[fname] = ctypes.CFUNCTYPE(typeconv(ftype.return_type), *[typeconv(_arg) for _arg in ftype.args])(faddr)
+		
+		self.find_profile_counters(modules, names)
+		self.compile_time = time() - start
+	
+	def __del__(self):
+		try:
+			self.release()
+		except Exception: # interpreter shutdown
+			pass
+	
+	def release(self):
+		"Free the code of a `shared` engine, also done when the object is garbage collected. The functions from `symbol` must not be called afterwards."
+		try:
+			generation = self.generation
+		except AttributeError:
+			return
+		del self.generation
+		self.symbol = {}
+		self.profile_counters = {}
+		with compile_lock:
+			engine_manager().remove(generation, self.modules)
+		self.modules = []
+	
+	def compile(self, modules, cache_directory, opt_level, objects):
+		start = time()
+		self.opt_level = opt_level
+		
 		if not compiler_initialized:
 			initialize_compiler()
 		target = llvmlite.binding.Target.from_default_triple()
 		target_machine = target.create_target_machine()
-		backing_mod = llvmlite.binding.parse_assembly("")
+		backing_mod = llvmlite.binding.parse_assembly("", context=self.context)
 		self.engine = llvmlite.binding.create_mcjit_compiler(backing_mod, target_machine)
 		
+		if cache_directory is None:
+			cache_directory = object_cache_directory
+		if cache_directory is not None:
+			self.cache_directory = Path(cache_directory).expanduser()
+			self.cache_directory.mkdir(parents=True, exist_ok=True)
+			self.engine.set_object_cache(self.object_compiled, self.object_lookup)
+		else:
+			self.cache_directory = None
+		
 		pmb = llvmlite.binding.PassManagerBuilder()
-		pmb.opt_level = 3
+		pmb.opt_level = opt_level
 		pm = llvmlite.binding.ModulePassManager()
 		pmb.populate(pm)
 		
+		self.object_keys = set()
+		self.cached_objects = {} # read once, a file removed meanwhile can not make the engine generate code from the unoptimized module
 		self.modules = []
 		for module in modules:
-			ll_module = llvmlite.binding.parse_assembly(str(module))
-			pm.run(ll_module)
+			ir = str(module)
+			ll_module = llvmlite.binding.parse_assembly(ir, context=self.context)
+			if self.cache_directory is not None:
+				ll_module.name = object_key(ir, target_machine.triple, opt_level)
+				self.object_keys.add(ll_module.name)
+				try:
+					self.cached_objects[ll_module.name] = self.object_path(ll_module).read_bytes()
+				except FileNotFoundError:
+					pm.run(ll_module)
+			else:
+				pm.run(ll_module)
 			self.engine.add_module(ll_module)
 		self.modules.append(ll_module)
+		for data in objects:
+			self.engine.add_object_file(llvmlite.binding.ObjectFileRef.from_data(data))
 		self.engine.finalize_object()
 		
 		self.symbol = {}
@@ -68,15 +396,156 @@ class Code:
 			for function in module.functions:
 				fname = function.name
 				ftype = function.function_type
+				if is_wide(ftype):
+					if fname + wide_suffix in module.globals:
+						self.symbol[fname] = wide_caller(ftype, self.engine.get_function_address(fname + wide_suffix))
+					continue
 				faddr = self.engine.get_function_address(fname)
 				cfunc = ctypes.CFUNCTYPE(typeconv(ftype.return_type), *[typeconv(_arg) for _arg in ftype.args])(faddr)
 				self.symbol[fname] = cfunc
+		
+		self.find_profile_counters(modules, {})
+		self.compile_time = time() - start
+	
+	def find_profile_counters(self, modules, names):
+		"Locate the counters emitted by `Compiler(profile=...)`, see `profile_report`."
+		self.profile_counters = {} # function name -> [calls counter, cycles counter or None]
+		for module in modules:
+			for value in module.global_values:
+				for kind, prefix in enumerate(('profile.calls.', 'profile.cycles.')):
+					if value.name.startswith(prefix):
+						address = self.engine.get_global_value_address(names.get(value.name, value.name))
+						self.profile_counters.setdefault(value.name[len(prefix):], [None, None])[kind] = ctypes.c_uint64.from_address(address)
+	
+	def profile_report(self):
+		"List of `(function name, calls, cycles)` of the profiled functions, the most expensive first. Cycles are `None` unless compiled with `profile='cycles'`."
+		report = [(_name, _calls.value, _cycles.value if _cycles is not None else None) for (_name, (_calls, _cycles)) in self.profile_counters.items()]
+		report.sort(key=lambda _entry: (_entry[2] or 0, _entry[1]), reverse=True)
+		return report
+	
+	def profile_reset(self):
+		for counters in self.profile_counters.values():
+			for counter in counters:
+				if counter is not None:
+					counter.value = 0
+	
+	def object_path(self, module):
+		return self.cache_directory / (module.name + '.o')
+	
+	def object_compiled(self, module, buffer):
+		"Object cache callback, store the compiled module."
+		if module.name not in self.object_keys:
+			return
+		path = self.object_path(module)
+		temporary = path.with_suffix('.tmp' + str(os.getpid()))
+		temporary.write_bytes(buffer)
+		os.replace(temporary, path) # atomic, concurrent workers may compile the same module
+	
+	def object_lookup(self, module):
+		"Object cache callback, return the compiled module read by `compile` or `None`."
+		return self.cached_objects.pop(module.name, None)
+	
+	def __enter__(self):
+		if not hasattr(self, 'generation'): # shared engine holds no constructors
+			self.engine.run_static_constructors()
+	
+	def __exit__(self, *arg):
+		if not hasattr(self, 'generation'):
+			self.engine.run_static_destructors()
+
+
+class TieredFunction:
+	"Forwards the calls to the function of the current tier of `TieredCode`."
+	
+	def __init__(self, tiered_code, name):
+		self.tiered_code = tiered_code
+		self.__name__ = name
+	
+	def __call__(self, *args):
+		return self.tiered_code.code.symbol[self.__name__](*args)
+
+
+class TieredSymbols:
+	def __init__(self, tiered_code):
+		self.tiered_code = tiered_code
+	
+	def __getitem__(self, name):
+		self.tiered_code.code.symbol[name] # raise KeyError early
+		return TieredFunction(self.tiered_code, name)
+	
+	def __contains__(self, name):
+		return name in self.tiered_code.code.symbol
+	
+	def keys(self):
+		return self.tiered_code.code.symbol.keys()
+	
+	def items(self):
+		return [(_name, self[_name]) for _name in self.keys()]
+
+
+class TieredCode:
+	"""
+	Tiered compilation. The modules are compiled at `low` optimization level right away, then recompiled at `high` level on a background thread.
+	Functions taken from `symbol` call the best tier available; the switch happens atomically between calls. `timings` maps the optimization
+	levels to their compile times, `tier` is the level in use and `report(level, seconds)` (if given) is called when a tier becomes available.
+	The background tier is compiled in a private LLVM context, not blocking other compilations. While the object is entered as a context manager,
+	the static constructors of every tier have run; the destructors of all tiers run on the last exit.
+	"""
+	
+	def __init__(self, modules, low=0, high=3, cache_directory=None, report=None, objects=()):
+		self.report = report
+		self.timings = {}
+		self.tiers = [] # keep the replaced engines alive, their functions may be still running
+		self.entered = 0
+		self.lock = RLock() # guards `tiers`, `code` and `entered`
+		self.symbol = TieredSymbols(self)
+		
+		self.install(Code(modules, cache_directory, low, objects))
+		
+		if high != low:
+			self.thread = Thread(target=lambda: self.install(Code(modules, cache_directory, high, objects, private_context=True)), name='TieredCode', daemon=True)
+			self.thread.start()
+		else:
+			self.thread = None
+	
+	def install(self, code):
+		with self.lock:
+			if self.entered:
+				code.__enter__()
+			self.tiers.append(code)
+			self.timings[code.opt_level] = code.compile_time
+			self.code = code # atomic switch
+		if self.report is not None:
+			self.report(code.opt_level, code.compile_time)
+	
+	@property
+	def tier(self):
+		return self.code.opt_level
+	
+	def profile_report(self):
+		"Profile of the current tier, see `Code.profile_report`."
+		return self.code.profile_report()
+	
+	def wait(self, timeout=None):
+		"Block until the highest tier is installed. Returns `True` if it is."
+		if self.thread is not None:
+			self.thread.join(timeout)
+			return not self.thread.is_alive()
+		return True
 	
 	def __enter__(self):
-		self.engine.run_static_constructors()
+		with self.lock:
+			if not self.entered:
+				for code in self.tiers:
+					code.__enter__()
+			self.entered += 1
 	
 	def __exit__(self, *arg):
-		self.engine.run_static_destructors()
+		with self.lock:
+			self.entered -= 1
+			if not self.entered:
+				for code in reversed(self.tiers):
+					code.__exit__(*arg)
 
 
 class Array:
@@ -89,10 +558,286 @@ class Array:
 		return Integer(builder.load(builder.gep(self.array, [Integer(0).jit_value, index]))) # TODO: overflow
 
 
+class Frame:
+	"Integers of one width in memory of the calling function, shared with the functions it calls (see `Compiler.declare_frame_function`). Indexes are constant."
+	
+	def __init__(self, pointer):
+		self.jit_value = pointer
+	
+	@classmethod
+	def allocate(cls, bits, size):
+		"Allocate a frame of `size` integers on the stack of the current function."
+		return cls(get_builder().alloca(llvmlite.ir.IntType(bits), size=max(size, 1)))
+	
+	def element(self, index):
+		return get_builder().gep(self.jit_value, [llvmlite.ir.IntType(32)(index)], inbounds=True)
+	
+	def __getitem__(self, index):
+		return Integer(get_builder().load(self.element(index)))
+	
+	def __setitem__(self, index, value):
+		if isinstance(value, int):
+			value = self.jit_value.type.pointee(value)
+		get_builder().store(getattr(value, 'jit_value', value), self.element(index))
+
+
+binary_field_table_exponent = 8 # binary fields up to this exponent are multiplied by a product table, larger ones by shifts and XORs
+
+
+def binary_field_products(exponent, reducing_polynomial_bitfield):
+	"Product table of the binary field of the exponent up to 8, the product of `a` and `b` is at the index `(a << exponent) | b`."
+	size = 1 << exponent
+	table = bytearray(size * size)
+	for a in range(1, size):
+		powers = [] # a * x**n
+		power = a
+		for n in range(exponent):
+			powers.append(power)
+			power <<= 1
+			if power >> exponent:
+				power ^= reducing_polynomial_bitfield
+		row = a << exponent
+		for b in range(1, size):
+			low = b & -b
+			table[row | b] = table[row | (b ^ low)] ^ powers[low.bit_length() - 1]
+	return bytes(table)
+
+
+def binary_field_multiplier(module, exponent, reducing_polynomial_bitfield):
+	"""
+	The internal function of `module` multiplying two elements of the binary field, emitted once per module. Small fields (see `binary_field_table_exponent`)
+	load the result from a product table (64 KiB for GF(2**8)), larger ones compute the carry-less product with the reduction in a branchless unrolled loop.
+	"""
+	
+	name = f'binary_field.mul.{exponent}.{reducing_polynomial_bitfield:x}'
+	try:
+		return module.get_global(name)
+	except KeyError:
+		pass
+	
+	itype = llvmlite.ir.IntType(Integer.round_8(exponent))
+	func = llvmlite.ir.Function(module, llvmlite.ir.FunctionType(itype, (itype, itype)), name)
+	func.linkage = 'internal'
+	func.attributes.add('alwaysinline')
+	builder = llvmlite.ir.IRBuilder(func.append_basic_block())
+	a, b = func.args
+	
+	if exponent <= binary_field_table_exponent:
+		data = binary_field_products(exponent, reducing_polynomial_bitfield)
+		table = llvmlite.ir.GlobalVariable(module, llvmlite.ir.ArrayType(llvmlite.ir.IntType(8), len(data)), name + '.table')
+		table.initializer = llvmlite.ir.Constant(table.value_type, bytearray(data))
+		table.global_constant = True
+		table.linkage = 'internal'
+		index_type = llvmlite.ir.IntType(32)
+		index = builder.or_(builder.shl(builder.zext(a, index_type), index_type(exponent)), builder.zext(b, index_type))
+		result = builder.load(builder.gep(table, [index_type(0), index], inbounds=True))
+		if itype.width > 8:
+			result = builder.zext(result, itype)
+	else:
+		wide = llvmlite.ir.IntType(Integer.round_8(exponent + 1))
+		if wide.width > itype.width:
+			a = builder.zext(a, wide)
+			b = builder.zext(b, wide)
+		result = wide(0)
+		for n in range(exponent):
+			bit = builder.and_(builder.lshr(b, wide(n)), wide(1))
+			result = builder.xor(result, builder.and_(a, builder.neg(bit)))
+			if n < exponent - 1: # a = a * x mod reducing polynomial
+				carry = builder.lshr(a, wide(exponent - 1))
+				a = builder.xor(builder.shl(a, wide(1)), builder.and_(wide(reducing_polynomial_bitfield), builder.neg(carry)))
+		if wide.width > itype.width:
+			result = builder.trunc(result, itype)
+	
+	builder.ret(result)
+	return func
+
+
+def binary_field_multiply(first, second, exponent, reducing_polynomial_bitfield):
+	"Emit the product of two binary field elements, given as JIT integers or ints below `2**exponent`, into the current function."
+	builder = get_builder()
+	func = binary_field_multiplier(builder.module, exponent, reducing_polynomial_bitfield)
+	itype = func.function_type.return_type
+	args = []
+	for value in first, second:
+		value = Integer(value).jit_value
+		if value.type.width != itype.width:
+			try:
+				value = itype(value.constant)
+			except AttributeError:
+				value = (builder.zext if value.type.width < itype.width else builder.trunc)(value, itype)
+		args.append(value)
+	return Integer(builder.call(func, args))
+
+
+def modular_width(modulus):
+	"Bit width of the JIT integers holding the residues modulo `modulus`: 8, 16, 32, 64 or 128."
+	return Integer.round_8((modulus - 1).bit_length())
+
+
+def modular_operand(value, itype):
+	"Resize the JIT integer, LLVM value or int `value` to `itype`, emitting into the current function."
+	if isinstance(value, int):
+		return itype(value % (1 << itype.width))
+	value = getattr(value, 'jit_value', value)
+	if value.type.width == itype.width:
+		return value
+	try:
+		return itype(value.constant % (1 << itype.width))
+	except AttributeError:
+		return (get_builder().zext if value.type.width < itype.width else get_builder().trunc)(value, itype)
+
+
+def modular_result(value, modulus):
+	"Wrap the reduced value, marked so that `modular_reduce` passes it through."
+	result = Integer(value)
+	result.modulus = modulus
+	return result
+
+
+def modular_reduce(value, modulus, bound=None):
+	"""
+	Emit the reduction of the JIT integer `value` (less than `bound`, by default the limit of its type) modulo the constant `modulus`, into the current function.
+	Powers of 2 are masked or wrap around natively. Values up to 64 bits are reduced by `urem` (lowered by LLVM to multiplications), wider values
+	by Barrett's method, since the 128-bit remainder would be a call into the compiler runtime. Returns `Integer` of `modular_width(modulus)` bits.
+	"""
+	
+	if getattr(value, 'modulus', None) == modulus:
+		return value
+	
+	builder = get_builder()
+	itype = llvmlite.ir.IntType(modular_width(modulus))
+	value = getattr(value, 'jit_value', value)
+	if bound is None:
+		bound = 1 << value.type.width
+	
+	if not modulus & (modulus - 1): # power of 2
+		value = modular_operand(value, itype)
+		if modulus != 1 << itype.width:
+			value = builder.and_(value, itype(modulus - 1))
+		return modular_result(value, modulus)
+	
+	if bound <= modulus:
+		return modular_result(modular_operand(value, itype), modulus)
+	
+	if bound <= 1 << 64:
+		if value.type.width > 64:
+			value = builder.trunc(value, llvmlite.ir.IntType(64))
+		return modular_result(modular_operand(builder.urem(value, value.type(modulus)), itype), modulus)
+	
+	k = modulus.bit_length()
+	if bound > 1 << (2 * k):
+		raise ValueError(f"Barrett reduction modulo {modulus} requires values below 2**{2 * k}.")
+	
+	wide = value.type
+	mu = (1 << (2 * k)) // modulus
+	product_type = llvmlite.ir.IntType(Integer.round_8(2 * k + 2))
+	quotient = builder.mul(builder.zext(builder.lshr(value, wide(k - 1)), product_type), product_type(mu)) # estimate, at most 2 below the quotient
+	quotient = builder.trunc(builder.lshr(quotient, product_type(k + 1)), wide)
+	remainder = builder.sub(value, builder.mul(quotient, wide(modulus)))
+	for n in range(2):
+		remainder = builder.select(builder.icmp_unsigned('>=', remainder, wide(modulus)), builder.sub(remainder, wide(modulus)), remainder)
+	return modular_result(modular_operand(remainder, itype), modulus)
+
+
+def modular_add(first, second, modulus):
+	"Emit the sum of two residues modulo the constant `modulus` into the current function, without overflowing the type of the residues."
+	builder = get_builder()
+	itype = llvmlite.ir.IntType(modular_width(modulus))
+	first = modular_operand(first, itype)
+	second = modular_operand(second, itype)
+	if not modulus & (modulus - 1):
+		return modular_reduce(builder.add(first, second), modulus)
+	complement = builder.sub(itype(modulus), second)
+	return modular_result(builder.select(builder.icmp_unsigned('>=', first, complement), builder.sub(first, complement), builder.add(first, second)), modulus)
+
+
+def modular_subtract(first, second, modulus):
+	"Emit the difference of two residues modulo the constant `modulus` into the current function."
+	builder = get_builder()
+	itype = llvmlite.ir.IntType(modular_width(modulus))
+	first = modular_operand(first, itype)
+	second = modular_operand(second, itype)
+	difference = builder.sub(first, second)
+	if not modulus & (modulus - 1):
+		return modular_reduce(difference, modulus)
+	return modular_result(builder.select(builder.icmp_unsigned('>=', first, second), difference, builder.add(difference, itype(modulus))), modulus)
+
+
+def modular_negate(value, modulus):
+	"Emit the negation of a residue modulo the constant `modulus` into the current function."
+	builder = get_builder()
+	itype = llvmlite.ir.IntType(modular_width(modulus))
+	value = modular_operand(value, itype)
+	if not modulus & (modulus - 1):
+		return modular_reduce(builder.neg(value), modulus)
+	return modular_result(builder.select(builder.icmp_unsigned('==', value, itype(0)), value, builder.sub(itype(modulus), value)), modulus)
+
+
+def modular_multiply(first, second, modulus):
+	"Emit the product of two residues modulo the constant `modulus` into the current function, computed at twice the width and reduced by `modular_reduce`."
+	builder = get_builder()
+	itype = llvmlite.ir.IntType(modular_width(modulus))
+	if not modulus & (modulus - 1):
+		return modular_reduce(builder.mul(modular_operand(first, itype), modular_operand(second, itype)), modulus)
+	wide = llvmlite.ir.IntType(Integer.round_8(2 * (modulus - 1).bit_length()))
+	return modular_reduce(builder.mul(modular_operand(first, wide), modular_operand(second, wide)), modulus, (modulus - 1) ** 2 + 1)
+
+
+profile_kinds = {True:('calls',), 'calls':('calls',), 'cycles':('calls', 'cycles')}
+
+
 class Compiler:
-	def __init__(self, name=''):
+	"""
+	Builder of the LLVM module. With `profile=True` (or `'calls'`) every function defined by `declare_function` counts its calls,
+	with `profile='cycles'` it also sums the CPU cycle counter over its body; see `Code.profile_report`. Without profiling nothing is emitted.
+	"""
+	
+	def __init__(self, name='', profile=False):
 		self.module = llvmlite.ir.Module(name=name)
 		self.defined_functions = {}
+		self.objects = [] # native object files compiled by `compile_parallel`
+		self.stream_functions = [] # names of the functions emitted by `declare_stream_function`
+		if profile not in (False, None) and profile not in profile_kinds:
+			raise ValueError(f"Unknown profile mode: {profile}.")
+		self.profile = profile or False
+	
+	def profile_counter(self, name, kinds, define=True):
+		"The global `i64` counters `profile.{kind}.{name}`."
+		counters = []
+		for kind in kinds:
+			counter = llvmlite.ir.GlobalVariable(self.module, llvmlite.ir.IntType(64), f'profile.{kind}.{name}')
+			if define:
+				counter.initializer = llvmlite.ir.IntType(64)(0)
+			counters.append(counter)
+		return counters
+	
+	def cycle_counter(self):
+		try:
+			return self.module.get_global('llvm.readcyclecounter')
+		except KeyError:
+			return llvmlite.ir.Function(self.module, llvmlite.ir.FunctionType(llvmlite.ir.IntType(64), ()), 'llvm.readcyclecounter')
+	
+	def compile_parallel(self, items, opt_level=None):
+		"""
+		Compile the `(name, item, weight)` triples, calling `item.compile(name, compiler)` in a process pool (see `utils.parallel`).
+		Items are balanced between the processes by `weight`; every process optimizes and generates its own object file, and the functions are declared in this module.
+		"""
+		
+		opt_level = optimization_level if opt_level is None else opt_level
+		count = max(1, min(utils.parallelism, len(items)))
+		groups = [[] for _n in range(count)]
+		weights = [0] * count
+		for name, item, weight in sorted(items, key=lambda _item: -_item[2]):
+			n = weights.index(min(weights))
+			groups[n].append((name, item))
+			weights[n] += weight
+		
+		for data, signatures in utils.parallel_map(compile_group, [(_group, opt_level, object_cache_directory, self.profile) for _group in groups if _group]):
+			self.objects.append(data)
+			for name, bits, arg_count in signatures:
+				self.declare_function(name, arg_count, bits)
+				if self.profile:
+					self.profile_counter(name, profile_kinds[self.profile], define=False) # defined in the object file
 	
 	def array(self, name, bits, elements):
 		itype = llvmlite.ir.IntType(bits)
@@ -102,6 +847,31 @@ class Compiler:
 		variable.global_constant = True
 		return Array(variable)
 	
+	def declare_frame_function(self, name, bits, callback):
+		"""
+		Emit the internal function `void name(iN *frame)`, never inlined, its body emitted by `callback(frame)` reading and writing a `Frame` of `bits`-wide integers.
+		Large functions are split into such parts to keep the size of every function bounded, the values passed between the parts through a frame of the caller.
+		"""
+		
+		itype = llvmlite.ir.IntType(bits)
+		func = llvmlite.ir.Function(self.module, llvmlite.ir.FunctionType(llvmlite.ir.VoidType(), (itype.as_pointer(),)), name=name)
+		func.linkage = 'internal'
+		func.attributes.add('noinline')
+		builder = llvmlite.ir.IRBuilder(func.append_basic_block())
+		
+		global current_builder
+		try:
+			old_builder = current_builder
+			current_builder = builder
+			callback(Frame(func.args[0]))
+			builder.ret_void()
+		finally:
+			current_builder = old_builder
+		
+		fn_object = Function(func, 1)
+		fn_object.__name__ = name
+		return fn_object
+	
 	def function(self, bits, arg_count=None, name=None):
 		return lambda callback: self.declare_function(name, arg_count, bits, callback)
 	
@@ -129,11 +899,19 @@ class Compiler:
 			block = func.append_basic_block()
 			builder = llvmlite.ir.IRBuilder(block)
 			
+			if self.profile:
+				counters = self.profile_counter(name, profile_kinds[self.profile])
+				builder.store(builder.add(builder.load(counters[0]), llvmlite.ir.IntType(64)(1)), counters[0])
+				if len(counters) > 1:
+					start = builder.call(self.cycle_counter(), ())
+			
 			global current_builder
 			try:
 				old_builder = current_builder
 				current_builder = builder
 				result = callback(*[Integer(_arg) for _arg in func.args])
+				if self.profile and len(counters) > 1:
+					builder.store(builder.add(builder.load(counters[1]), builder.sub(builder.call(self.cycle_counter(), ()), start)), counters[1])
 				if result == None:
 					builder.ret(llvmlite.ir.VoidType()())
 				else:
@@ -148,11 +926,329 @@ class Compiler:
 		fn_object.__name__ = name
 		return fn_object
 	
+	def declare_stream_function(self, name, bits, element_bits, input_width, output_width, memory_length, memory_width, output_functions, state_functions):
+		"""
+		Emit the function `void name(i8 *input, i8 *output, i8 *state, i64 count)` running the automaton over `count` packed symbols.
+		Symbols are vectors of `element_bits`-wide elements packed little-endian, element `i` at bit `i * element_bits`, rounded up to full bytes.
+		The state buffer holds `memory_length` packed vectors of `memory_width` elements, newest first. It is read at entry and written back at exit.
+		`output_functions` and `state_functions` are lists of pairs (function name, argument slots), where slot `t * memory_width + i` is the element `i`
+		of the state vector `t` steps back and slot `memory_length * memory_width + i` is the element `i` of the input symbol.
+		The functions must be defined in this module before.
+		"""
+		
+		itype = llvmlite.ir.IntType(bits)
+		byte = llvmlite.ir.IntType(8)
+		size_t = llvmlite.ir.IntType(64)
+		
+		func_type = llvmlite.ir.FunctionType(llvmlite.ir.VoidType(), (byte.as_pointer(), byte.as_pointer(), byte.as_pointer(), size_t))
+		func = llvmlite.ir.Function(self.module, func_type, name=name)
+		self.defined_functions[name] = func
+		self.stream_functions.append(name)
+		in_ptr, out_ptr, state_ptr, count = func.args
+		
+		def vector_bytes(width):
+			return (width * element_bits + 7) // 8
+		
+		def unpack(builder, ptr, width):
+			if not width:
+				return []
+			if element_bits == bits:
+				ptr = builder.bitcast(ptr, itype.as_pointer())
+				return [builder.load(builder.gep(ptr, [size_t(_i)]), align=1) for _i in range(width)]
+			length = vector_bytes(width)
+			acc_type = llvmlite.ir.IntType(8 * length)
+			acc = acc_type(0)
+			for b in range(length):
+				v = builder.zext(builder.load(builder.gep(ptr, [size_t(b)])), acc_type)
+				acc = builder.or_(acc, builder.shl(v, acc_type(8 * b)) if b else v)
+			result = []
+			for i in range(width):
+				v = builder.and_(builder.lshr(acc, acc_type(i * element_bits)), acc_type((1 << element_bits) - 1))
+				if acc_type.width > bits:
+					v = builder.trunc(v, itype)
+				elif acc_type.width < bits:
+					v = builder.zext(v, itype)
+				result.append(v)
+			return result
+		
+		def pack(builder, ptr, elements):
+			if not elements:
+				return
+			if element_bits == bits:
+				ptr = builder.bitcast(ptr, itype.as_pointer())
+				for i, v in enumerate(elements):
+					builder.store(v, builder.gep(ptr, [size_t(i)]), align=1)
+				return
+			length = vector_bytes(len(elements))
+			acc_type = llvmlite.ir.IntType(8 * length)
+			acc = acc_type(0)
+			for i, v in enumerate(elements):
+				v = builder.and_(v, itype((1 << element_bits) - 1))
+				if acc_type.width > bits:
+					v = builder.zext(v, acc_type)
+				elif acc_type.width < bits:
+					v = builder.trunc(v, acc_type)
+				acc = builder.or_(acc, builder.shl(v, acc_type(i * element_bits)) if i else v)
+			for b in range(length):
+				builder.store(builder.trunc(builder.lshr(acc, acc_type(8 * b)) if b else acc, byte), builder.gep(ptr, [size_t(b)]))
+		
+		history_size = memory_length * memory_width
+		state_bytes = vector_bytes(memory_width)
+		in_bytes = vector_bytes(input_width)
+		out_bytes = vector_bytes(output_width)
+		
+		entry_block = func.append_basic_block('entry')
+		loop_block = func.append_basic_block('loop')
+		body_block = func.append_basic_block('body')
+		exit_block = func.append_basic_block('exit')
+		
+		builder = llvmlite.ir.IRBuilder(entry_block)
+		values = builder.alloca(itype, size=max(history_size + input_width, 1))
+		def slot(k):
+			return builder.gep(values, [llvmlite.ir.IntType(32)(k)])
+		for t in range(memory_length):
+			for i, v in enumerate(unpack(builder, builder.gep(state_ptr, [size_t(t * state_bytes)]), memory_width)):
+				builder.store(v, slot(t * memory_width + i))
+		builder.branch(loop_block)
+		
+		builder.position_at_end(loop_block)
+		n = builder.phi(size_t)
+		n.add_incoming(size_t(0), entry_block)
+		builder.cbranch(builder.icmp_unsigned('<', n, count), body_block, exit_block)
+		
+		builder.position_at_end(body_block)
+		for i, v in enumerate(unpack(builder, builder.gep(in_ptr, [builder.mul(n, size_t(in_bytes))]), input_width)):
+			builder.store(v, slot(history_size + i))
+		
+		output = [builder.call(self.defined_functions[_fname], [builder.load(slot(_k)) for _k in _args]) for (_fname, _args) in output_functions]
+		pack(builder, builder.gep(out_ptr, [builder.mul(n, size_t(out_bytes))]), output)
+		
+		if memory_length:
+			state = [builder.call(self.defined_functions[_fname], [builder.load(slot(_k)) for _k in _args]) for (_fname, _args) in state_functions]
+			for k in reversed(range(memory_width, history_size)):
+				builder.store(builder.load(slot(k - memory_width)), slot(k))
+			for i, v in enumerate(state):
+				builder.store(v, slot(i))
+		
+		n.add_incoming(builder.add(n, size_t(1)), body_block)
+		builder.branch(loop_block)
+		
+		builder.position_at_end(exit_block)
+		for t in range(memory_length):
+			pack(builder, builder.gep(state_ptr, [size_t(t * state_bytes)]), [builder.load(slot(t * memory_width + _i)) for _i in range(memory_width)])
+		builder.ret_void()
+		
+		fn_object = Function(func, len(func.args))
+		fn_object.__name__ = name
+		return fn_object
+	
+	def declare_search_function(self, name, arg_count, bits, ring_size):
+		"""
+		Emit the function `i64 name(iN (*function)(iN, ...), i64 count, i64 seed, i64 target)` evaluating `function` of `arg_count` arguments of `bits` width on `count` valuations,
+		each argument one of `0 ... ring_size - 1`. Returns 0 if the result equals `target` on all of them, else 1 + the number of the first differing valuation.
+		With `seed == 0` the valuations are enumerated exhaustively starting from all zeros in the modular Gray code order, changing one argument per step
+		(the argument `k` is incremented modulo `ring_size` at the step `n` when `ring_size**k` is the highest power dividing `n`).
+		Otherwise `count` random valuations are generated by a 64-bit linear congruential generator from `seed`. Requires `bits` and `ring_size` up to 64 bits.
+		The kernel does not depend on `function`, see `search_kernel`.
+		"""
+		
+		itype = llvmlite.ir.IntType(bits)
+		size_t = llvmlite.ir.IntType(64)
+		
+		evaluated_type = llvmlite.ir.FunctionType(itype, (itype,) * arg_count)
+		func = llvmlite.ir.Function(self.module, llvmlite.ir.FunctionType(size_t, (evaluated_type.as_pointer(), size_t, size_t, size_t)), name=name)
+		self.defined_functions[name] = func
+		evaluated, count, seed, target = func.args
+		
+		entry_block = func.append_basic_block('entry')
+		loop_block = func.append_basic_block('loop')
+		start_block = func.append_basic_block('start')
+		random_block = func.append_basic_block('random')
+		body_block = func.append_basic_block('body')
+		advance_block = func.append_basic_block('advance')
+		if arg_count:
+			carry_block = func.append_basic_block('carry')
+			gray_block = func.append_basic_block('gray')
+		next_block = func.append_basic_block('next')
+		found_block = func.append_basic_block('found')
+		exit_block = func.append_basic_block('exit')
+		
+		builder = llvmlite.ir.IRBuilder(entry_block)
+		values = builder.alloca(itype, size=max(arg_count, 1))
+		def slot(k):
+			return builder.gep(values, [k if isinstance(k, llvmlite.ir.Value) else size_t(k)])
+		for k in range(arg_count):
+			builder.store(itype(0), slot(k))
+		exhaustive = builder.icmp_unsigned('==', seed, size_t(0))
+		builder.branch(loop_block)
+		
+		builder.position_at_end(loop_block)
+		n = builder.phi(size_t)
+		n.add_incoming(size_t(0), entry_block)
+		state = builder.phi(size_t)
+		state.add_incoming(seed, entry_block)
+		builder.cbranch(builder.icmp_unsigned('<', n, count), start_block, exit_block)
+		
+		builder.position_at_end(start_block)
+		builder.cbranch(exhaustive, body_block, random_block)
+		
+		builder.position_at_end(random_block) # one random value per argument
+		if not arg_count:
+			generated = state
+			builder.branch(body_block)
+		else:
+			k = builder.phi(size_t)
+			k.add_incoming(size_t(0), start_block)
+			previous = builder.phi(size_t)
+			previous.add_incoming(state, start_block)
+			generated = builder.add(builder.mul(previous, size_t(6364136223846793005)), size_t(1442695040888963407))
+			if ring_size <= 1 << 32: # high bits of the generator scaled to the ring size
+				value = builder.lshr(builder.mul(builder.lshr(generated, size_t(32)), size_t(ring_size)), size_t(32))
+			elif ring_size < 1 << 64:
+				value = builder.urem(generated, size_t(ring_size))
+			else:
+				value = generated
+			builder.store(builder.trunc(value, itype) if itype.width < 64 else value, slot(k))
+			k.add_incoming(builder.add(k, size_t(1)), random_block)
+			previous.add_incoming(generated, random_block)
+			builder.cbranch(builder.icmp_unsigned('<', builder.add(k, size_t(1)), size_t(arg_count)), random_block, body_block)
+		
+		builder.position_at_end(body_block)
+		current = builder.phi(size_t)
+		current.add_incoming(state, start_block)
+		current.add_incoming(generated, random_block)
+		result = builder.call(evaluated, [builder.load(slot(_k)) for _k in range(arg_count)])
+		if itype.width < 64:
+			result = builder.zext(result, size_t)
+		builder.cbranch(builder.icmp_unsigned('!=', result, target), found_block, advance_block)
+		
+		builder.position_at_end(advance_block)
+		step = builder.add(n, size_t(1))
+		if arg_count:
+			builder.cbranch(exhaustive, carry_block, next_block)
+		else:
+			builder.branch(next_block)
+		
+		if arg_count: # the modular Gray code step
+			builder.position_at_end(carry_block) # find the argument to increment
+			j = builder.phi(size_t)
+			j.add_incoming(step, advance_block)
+			k = builder.phi(size_t)
+			k.add_incoming(size_t(0), advance_block)
+			if ring_size < 1 << 64:
+				divisible = builder.icmp_unsigned('==', builder.urem(j, size_t(ring_size)), size_t(0))
+			else: # no step number is divisible by 2**64
+				divisible = llvmlite.ir.IntType(1)(0)
+			j.add_incoming(builder.udiv(j, size_t(ring_size)), carry_block)
+			k.add_incoming(builder.add(k, size_t(1)), carry_block)
+			builder.cbranch(builder.and_(divisible, builder.icmp_unsigned('<', k, size_t(arg_count - 1))), carry_block, gray_block)
+			
+			builder.position_at_end(gray_block)
+			digit = builder.add(builder.zext(builder.load(slot(k)), size_t) if itype.width < 64 else builder.load(slot(k)), size_t(1))
+			if ring_size < 1 << 64: # 2**64 wraps around by itself
+				digit = builder.select(builder.icmp_unsigned('==', digit, size_t(ring_size)), size_t(0), digit)
+			builder.store(builder.trunc(digit, itype) if itype.width < 64 else digit, slot(k))
+			builder.branch(next_block)
+		
+		builder.position_at_end(next_block)
+		n.add_incoming(step, next_block)
+		state.add_incoming(current, next_block)
+		builder.branch(loop_block)
+		
+		builder.position_at_end(found_block)
+		builder.ret(builder.add(n, size_t(1)))
+		
+		builder.position_at_end(exit_block)
+		builder.ret(size_t(0))
+		
+		fn_object = Function(func, len(func.args))
+		fn_object.__name__ = name
+		return fn_object
+	
 	def __str__(self):
 		return str(self.module)
 	
-	def compile(self):
-		return Code([self.module])
+	def declare_wide_entries(self):
+		"""
+		Emit the entry point `void {name}.wide(i8 *arguments, i8 *result)` for every external function with integers wider than 64 bits,
+		the arguments packed one after another little-endian, each in whole bytes. `Code.symbol` calls these instead (see `wide_caller`).
+		Done by `compile`, `export` and `compile_tiered`.
+		"""
+		
+		byte = llvmlite.ir.IntType(8)
+		size_t = llvmlite.ir.IntType(64)
+		for function in list(self.module.functions):
+			ftype = function.function_type
+			if function.linkage == 'internal' or function.name.endswith(wide_suffix) or function.name + wide_suffix in self.module.globals or not is_wide(ftype):
+				continue
+			if not all(isinstance(_type, llvmlite.ir.IntType) for _type in ftype.args) or not isinstance(ftype.return_type, (llvmlite.ir.IntType, llvmlite.ir.VoidType)):
+				continue
+			
+			entry = llvmlite.ir.Function(self.module, llvmlite.ir.FunctionType(llvmlite.ir.VoidType(), (byte.as_pointer(), byte.as_pointer())), name=function.name + wide_suffix)
+			arguments, result = entry.args
+			builder = llvmlite.ir.IRBuilder(entry.append_basic_block())
+			values = []
+			offset = 0
+			for arg_type in ftype.args:
+				values.append(builder.load(builder.bitcast(builder.gep(arguments, [size_t(offset)]), arg_type.as_pointer()), align=1))
+				offset += (arg_type.width + 7) // 8
+			value = builder.call(function, values)
+			if isinstance(ftype.return_type, llvmlite.ir.IntType):
+				builder.store(value, builder.bitcast(result, ftype.return_type.as_pointer()), align=1)
+			builder.ret_void()
+	
+	def declare_step_entries(self):
+		"""
+		Emit the entry point `void {name}_step(i8 *symbol, i8 *output, i8 *state)` for every stream function `{name}_stream` (see `declare_stream_function`),
+		processing exactly one symbol, and its buffer sizes `{name}_step_info` copied from `{name}_stream_info` if present. Done by `export`, see `loader.Library.step`.
+		"""
+		
+		byte = llvmlite.ir.IntType(8)
+		size_t = llvmlite.ir.IntType(64)
+		for name in self.stream_functions:
+			if not name.endswith('_stream'):
+				continue
+			step_name = name[:-len('_stream')] + '_step'
+			if step_name in self.module.globals:
+				continue
+			
+			entry = llvmlite.ir.Function(self.module, llvmlite.ir.FunctionType(llvmlite.ir.VoidType(), (byte.as_pointer(), byte.as_pointer(), byte.as_pointer())), name=step_name)
+			builder = llvmlite.ir.IRBuilder(entry.append_basic_block())
+			builder.call(self.defined_functions[name], list(entry.args) + [size_t(1)])
+			builder.ret_void()
+			
+			try:
+				info = self.module.get_global(name + '_info')
+			except KeyError:
+				continue
+			step_info = llvmlite.ir.GlobalVariable(self.module, info.value_type, step_name + '_info')
+			step_info.initializer = info.initializer
+			step_info.global_constant = info.global_constant
+	
+	def compile(self, cache_directory=None, opt_level=None, shared=False):
+		self.declare_wide_entries()
+		return Code([self.module], cache_directory, opt_level, self.objects, shared)
+	
+	def export(self, path, opt_level=None, cache_directory=None):
+		"""
+		Write the module, together with the objects from `compile_parallel`, as a native shared library with C ABI (see `loader.Library`).
+		Linking uses the system C compiler (`CC` environment variable, `cc` by default).
+		"""
+		
+		opt_level = optimization_level if opt_level is None else opt_level
+		self.declare_wide_entries()
+		self.declare_step_entries()
+		with TemporaryDirectory() as directory:
+			paths = []
+			for n, data in enumerate([compile_object(str(self.module), opt_level, cache_directory if cache_directory is not None else object_cache_directory)] + self.objects):
+				paths.append(Path(directory) / f'{n}.o')
+				paths[-1].write_bytes(data)
+			subprocess.run([os.environ.get('CC', 'cc'), '-shared', '-o', str(path)] + [str(_path) for _path in paths], check=True)
+	
+	def compile_tiered(self, low=0, high=3, cache_directory=None, report=None):
+		"Compile quickly at `low` optimization level and recompile at `high` in the background, see `TieredCode`."
+		self.declare_wide_entries()
+		return TieredCode([self.module], low, high, cache_directory, report, self.objects)
 
 
 current_builder = None
@@ -171,6 +1267,8 @@ class Function:
 			raise TypeError
 		builder = get_builder()
 		result = builder.call(self.func, [_arg.jit_value for _arg in args])
+		if isinstance(self.func.function_type.return_type, llvmlite.ir.VoidType):
+			return None
 		return Integer(result)
 
 
@@ -193,7 +1291,7 @@ class Integer:
 
 		if self.jit_value.type.width > self.max_bits: raise ValueError("Maximum bit width exceeded")
 	
-	max_bits = 64
+	max_bits = 128
 	
 	@staticmethod
 	def round_8(i):
@@ -428,6 +1526,11 @@ class Integer:
 			except AttributeError:
 				second = builder.zext(second, result_type)
 		
+		try:
+			return self.__class__(result_type(first.constant ^ second.constant))
+		except AttributeError:
+			pass
+		
 		return self.__class__(builder.xor(first, second))
 	
 	__rxor__ = __xor__
@@ -574,6 +1677,30 @@ if __debug__ and __name__ == '__main__':
 	def xorer(x, y):
 		return x ^ y
 	
+	@compiler.function(bits=32)
+	def addmod32(x, y):
+		return modular_add(x, y, (1 << 32) - 5)
+	
+	@compiler.function(bits=64)
+	def submod64(x, y):
+		return modular_subtract(x, y, (1 << 64) - 59)
+	
+	@compiler.function(bits=64)
+	def mulmod64(x, y):
+		return modular_multiply(x, y, (1 << 64) - 59)
+	
+	@compiler.function(bits=64)
+	def mulwrap64(x, y):
+		return modular_multiply(x, y, 1 << 64)
+	
+	@compiler.function(bits=128)
+	def mulmod128(x, y):
+		return modular_multiply(x, y, (1 << 127) - 1)
+	
+	@compiler.function(bits=128)
+	def negmod128(x):
+		return modular_negate(x, (1 << 127) - 1)
+	
 
 	
 	print(compiler)
@@ -596,8 +1723,89 @@ if __debug__ and __name__ == '__main__':
 		assert ander(47, 23) == 47 & 23
 		assert orer(47, 23) == 47 | 23
 		assert xorer(47, 23) == 47 ^ 23
+		assert addmod32((1 << 32) - 6, (1 << 32) - 7) == (1 << 32) - 8
+		assert submod64(3, 5) == (1 << 64) - 61
+		assert mulmod64((1 << 64) - 60, (1 << 64) - 60) == 1
+		assert mulmod64(1 << 63, 1 << 62) == (1 << 125) % ((1 << 64) - 59)
+		assert mulwrap64((1 << 63) + 3, 6) == 18
+		assert mulmod128((1 << 126) + 5, (1 << 125) + 7) == ((1 << 126) + 5) * ((1 << 125) + 7) % ((1 << 127) - 1)
+		assert negmod128(1) == (1 << 127) - 2 and negmod128(0) == 0
 
 
 
 
 
+	
+	with TemporaryDirectory() as directory:
+		with object_cache(directory):
+			code_1 = compiler.compile()
+			assert len(list(Path(directory).glob('*.o'))) == 1
+			code_2 = compiler.compile()
+			assert len(list(Path(directory).glob('*.o'))) == 1
+			for path in Path(directory).glob('*.o'): # evicted, compiled and optimized again
+				path.unlink()
+			code_3 = compiler.compile()
+		assert len(list(Path(directory).glob('*.o'))) == 1
+		for code in (code_1, code_2, code_3):
+			with code:
+				assert code.symbol['adder'](2, 2) == 4
+				assert code.symbol['inc2'](8) == 10
+	
+	timings = []
+	code = compiler.compile_tiered(report=lambda _level, _seconds: timings.append(_level))
+	adder_t = code.symbol['adder']
+	with code:
+		assert adder_t(2, 2) == 4
+		assert code.wait()
+		assert code.tier == 3
+		assert adder_t(2, 3) == 5
+	assert timings == [0, 3]
+	assert sorted(code.timings.keys()) == [0, 3]
+	
+	with compile_lock: # the background tier compiles without the lock
+		code = compiler.compile_tiered()
+		assert code.wait(60)
+	with code:
+		with code:
+			assert code.entered == 2
+			assert adder_t(2, 3) == 5
+	assert code.entered == 0
+	
+	manager = engine_manager()
+	codes = [compiler.compile(shared=True) for _n in range(3)]
+	assert manager.live_code_size > 0
+	for code in codes:
+		with code:
+			assert code.symbol['square'](4) == 16
+			assert code.symbol['inc2'](8) == 10
+	live = manager.live_code_size
+	codes[0].release()
+	assert manager.live_code_size < live
+	assert codes[1].symbol['adder'](2, 2) == 4
+	for code in codes[1:]:
+		code.release()
+	assert manager.live_code_size == 0
+	
+	for profile in ('calls', 'cycles'):
+		profiled = Compiler(profile=profile)
+		
+		@profiled.function(bits=8)
+		def double(x):
+			return (x + x) & 255
+		
+		@profiled.function(bits=8)
+		def quadruple(x):
+			return double(double(x))
+		
+		for shared in (False, True):
+			code = profiled.compile(shared=shared)
+			with code:
+				for n in range(10):
+					assert code.symbol['quadruple'](n) == 4 * n
+			report = dict((_name, (_calls, _cycles)) for (_name, _calls, _cycles) in code.profile_report())
+			assert report['quadruple'][0] == 10 and report['double'][0] == 20
+			assert (report['quadruple'][1] is None) == (profile == 'calls')
+			code.profile_reset()
+			assert all(_calls == 0 for (_name, _calls, _cycles) in code.profile_report())
+	
+	assert not Compiler().compile().profile_report()
@@ -8,6 +8,8 @@ from collections import Counter
 from itertools import chain, product
 import operator
 
+import utils
+
 from utils import randbelow, random_permutation, random_sample, parallel_map, parallel_starmap, canonical, optimized, evaluate, substitute
 from algebra import AlgebraicStructure
 from rings import BooleanRing
@@ -321,9 +323,21 @@ class Vector(AlgebraicStructure):
 	def circuit_size(self):
 		return sum(_value.circuit_size() for _value in self.values())
 	
+	@staticmethod
+	def compile_all(vectors, module):
+		"""
+		Compile the `(name, vector)` pairs, component `n` as the function `{name}_{n}`. Inside `utils.parallel`, vectors over `BooleanRing` or `ModularRing`
+		are compiled in a process pool (see `Compiler.compile_parallel`); other rings need tables emitted into `module` and are compiled in place.
+		"""
+		items = [(name + '_' + str(_n), _el) for (name, vector) in vectors for (_n, _el) in enumerate(vector)]
+		if utils.parallelism and len(items) > 1 and all(_vector.algebra.base_ring.base_ring.algebra_name in ('BooleanRing', 'ModularRing') for (_name, _vector) in vectors):
+			module.compile_parallel([(_name, _el, _el.dag_size()) for (_name, _el) in items])
+		else:
+			for name, el in items:
+				el.compile(name, module)
+	
 	def compile(self, name, module):
-		for n, el in enumerate(self):
-			el.compile(name + '_' + str(n), module)
+		self.compile_all([(name, self)], module)
 	
 	def wrap_compiled(self, name, engine):
 		wrapped = []
@@ -335,6 +349,50 @@ class Vector(AlgebraicStructure):
 			return algebra([_w(**kwargs) for _w in wrapped])
 		return fn
 	
+	def evaluate_slots(self, slots, values, cache=None):
+		"Evaluate the polynomial vector on the flat valuation array `values`, see `Polynomial.evaluate_slots`. Subterms shared between components are evaluated once."
+		if cache is None:
+			cache = {}
+		algebra = self.__class__.get_algebra(base_ring=self.algebra.base_ring.base_ring)
+		return algebra([_el.evaluate_slots(slots, values, cache) for _el in self])
+	
+	def vectorize(self, slots):
+		"Return the NumPy `vectorized.Program` evaluating the polynomial vector over whole arrays of flat valuations (see `evaluate_slots`). Requires NumPy."
+		from vectorized import Program
+		return Program(list(self), slots)
+	
+	def wrap_compiled_slots(self, name, engine, slots):
+		"Like `wrap_compiled`, but the returned function takes a flat array of ints, see `Polynomial.wrap_compiled_slots`."
+		wrapped = []
+		for n, el in enumerate(self):
+			wrapped.append(el.wrap_compiled_slots(name + '_' + str(n), engine, slots))
+		algebra = self.__class__.get_algebra(base_ring=self.algebra.base_ring.base_ring)
+	
+		def fn(values):
+			return algebra([_w(values) for _w in wrapped])
+		return fn
+	
+	def evaluate_bitsliced(self, slots, words, mask, cache=None):
+		"Bitsliced evaluation of the polynomial vector over a ring of size 2, see `Polynomial.evaluate_bitsliced`. Returns the list of result words."
+		if cache is None:
+			cache = {}
+		return [_el.evaluate_bitsliced(slots, words, mask, cache) for _el in self]
+	
+	def substitute_variables(self, substitution, cache=None):
+		"Substitute variables by id in every component, see `Polynomial.substitute_variables`. Subterms shared between components are processed once."
+		if cache is None:
+			cache = {}
+		return self.algebra([_el.substitute_variables(substitution, cache) for _el in self])
+	
+	def dag_size(self):
+		"Number of distinct nodes in all components together, see `Polynomial.dag_size`."
+		visited = set()
+		return sum(_value.dag_size(visited) for _value in self.values())
+	
+	def compile_bitsliced(self, name, compiler, bits=64):
+		for n, el in enumerate(self):
+			el.compile_bitsliced(name + '_' + str(n), compiler, bits)
+	
 	def is_zero(self):
 		return all(_element.is_zero() for _element in self)
 
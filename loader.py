@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+#-*- coding:utf8 -*-
+
+
+"Loader of automata exported by `Compiler.export` as shared libraries. Depends only on `ctypes`, not on the algebra modules or llvmlite."
+
+
+import ctypes
+from array import array
+from pathlib import Path
+
+
+__all__ = 'Library', 'buffer_address', 'wrap_stream_kernel'
+
+
+def buffer_address(buf):
+	"Address of a writable buffer, for passing to native code."
+	buf = memoryview(buf).cast('B')
+	return ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf)) if len(buf) else None
+
+
+def wrap_stream_kernel(kernel, name, in_bytes, out_bytes, state_size, allocate):
+	"Python wrapper for the native stream loop emitted by `Compiler.declare_stream_function`. The output buffer is created by `allocate(size_in_bytes)`."
+	
+	def fn(data, state=None):
+		data = memoryview(data).cast('B')
+		if not in_bytes:
+			raise ValueError("Automaton does not read any input")
+		if len(data) % in_bytes:
+			raise ValueError("Buffer size is not a multiple of the symbol size")
+		count = len(data) // in_bytes
+		
+		if data.readonly:
+			data = bytearray(data)
+		
+		if state is None:
+			state = bytearray(state_size)
+		elif memoryview(state).nbytes != state_size:
+			raise ValueError("Invalid state buffer size")
+		
+		result = allocate(count * out_bytes)
+		kernel(buffer_address(data), buffer_address(result), buffer_address(state), count)
+		return result
+	
+	fn.__name__ = name
+	return fn
+
+
+class Library:
+	"""
+	Shared library with exported automata. `library.stream(name)` returns the function `fn(data, state=None)` of the stream kernel `name`
+	(`{name}_stream` for `Automaton.compile(name, ...)`, `{name}_bitsliced` for `Automaton.compile_bitsliced`), see `Automaton.stream`.
+	"""
+	
+	def __init__(self, path):
+		self.path = Path(path)
+		self.library = ctypes.CDLL(str(self.path.resolve()))
+	
+	def kernel(self, kernel_name):
+		"The raw C function `void kernel_name(uint8_t *input, uint8_t *output, uint8_t *state, uint64_t count)` and its buffer sizes `(input symbol, output symbol, state)`."
+		kernel = getattr(self.library, kernel_name)
+		kernel.restype = None
+		kernel.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint64]
+		in_bytes, out_bytes, state_size = (ctypes.c_uint64 * 3).in_dll(self.library, kernel_name + '_info')
+		return kernel, in_bytes, out_bytes, state_size
+	
+	def stream(self, name):
+		"Buffer stream function of the automaton compiled as `name`."
+		kernel, in_bytes, out_bytes, state_size = self.kernel(name + '_stream')
+		function = wrap_stream_kernel(kernel, name, in_bytes, out_bytes, state_size, bytearray)
+		function.state_size = state_size
+		return function
+	
+	def stream_bitsliced(self, name):
+		"Bitsliced stream function of the automaton compiled by `compile_bitsliced` as `name`, see `Automaton.stream_bitsliced`."
+		kernel, in_bytes, out_bytes, state_size = self.kernel(name + '_bitsliced')
+		function = wrap_stream_kernel(kernel, name, in_bytes, out_bytes, state_size, lambda _size: array('Q', bytes(_size)))
+		function.state_size = state_size
+		return function
+	
+	def step(self, name):
+		"""
+		Function `fn(symbol, state)` processing one packed input symbol, returning the packed output symbol and updating `state` in place.
+		Calls the native entry point `void {name}_step(uint8_t *symbol, uint8_t *output, uint8_t *state)` (see `Compiler.declare_step_entries`).
+		"""
+		entry = getattr(self.library, name + '_step')
+		entry.restype = None
+		entry.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+		in_bytes, out_bytes, state_size = (ctypes.c_uint64 * 3).in_dll(self.library, name + '_step_info')
+		
+		def step(symbol, state):
+			symbol = memoryview(symbol).cast('B')
+			if len(symbol) != in_bytes:
+				raise ValueError("Invalid symbol size")
+			if memoryview(state).nbytes != state_size:
+				raise ValueError("Invalid state buffer size")
+			if symbol.readonly:
+				symbol = bytearray(symbol)
+			output = bytearray(out_bytes)
+			entry(buffer_address(symbol), buffer_address(output), buffer_address(state))
+			return output
+		
+		step.__name__ = name
+		step.state_size = state_size
+		return step
+
+
+if __name__ == '__main__':
+	import sys
+	
+	if len(sys.argv) != 3:
+		print(f"Usage: {sys.argv[0]} library automaton_name < input > output", file=sys.stderr)
+		print("Runs the exported automaton (from the zero state) on the packed input symbols, writes the packed output symbols.", file=sys.stderr)
+		sys.exit(2)
+	
+	sys.stdout.buffer.write(Library(sys.argv[1]).stream(sys.argv[2])(sys.stdin.buffer.read()))
@@ -12,12 +12,12 @@ from math import log10, ceil
 from weakref import WeakValueDictionary
 from random import choice
 
-from utils import Immutable, random_sample, parallel_map, parallel_starmap, canonical, optimized, evaluate, substitute
+from utils import Immutable, randbelow, random_sample, parallel_map, parallel_starmap, canonical, optimized, evaluate, substitute
 from algebra import Algebra, AlgebraicStructure
 from rings import BooleanRing
 
 
-__all__ = 'Polynomial',
+__all__ = 'Polynomial', 'VariableRegistry', 'variable_registry'
 
 
 class AllowCanonical:
@@ -89,6 +89,68 @@ class Identical:
 		return self.str_cache
 
 
+class VariableRegistry:
+	"""
+	Numbering of variables shared by all polynomial algebras. Every variable name gets an integer id, stable for the lifetime of the process,
+	and metadata: kind (like 'x' for input, 's' for state), time offset and index. Names registered without metadata are parsed once,
+	`kind_time_index` or `kind_index`; other names get kind `None`.
+	"""
+	
+	def __init__(self):
+		self.ids = {}
+		self.names = []
+		self.metadata = []
+	
+	@staticmethod
+	def parse(name):
+		kind, *numbers = name.split('_')
+		try:
+			numbers = [int(_n) for _n in numbers]
+		except ValueError:
+			return None, None, None
+		if len(numbers) == 1:
+			return kind, 0, numbers[0]
+		elif len(numbers) == 2:
+			return kind, numbers[0], numbers[1]
+		else:
+			return None, None, None
+	
+	def register(self, name, kind=None, time=None, index=None):
+		"Returns the id of the variable `name`, registering it if needed."
+		
+		try:
+			n = self.ids[name]
+		except KeyError:
+			pass
+		else:
+			if kind is not None and self.metadata[n] != (kind, time, index):
+				raise ValueError(f"Variable {name} already registered with metadata {self.metadata[n]}.")
+			return n
+		
+		n = len(self.names)
+		self.ids[name] = n
+		self.names.append(name)
+		self.metadata.append((kind, time, index) if kind is not None else self.parse(name))
+		return n
+	
+	__getitem__ = register
+	
+	def kind(self, n):
+		return self.metadata[n][0]
+	
+	def time(self, n):
+		return self.metadata[n][1]
+	
+	def index(self, n):
+		return self.metadata[n][2]
+	
+	def __len__(self):
+		return len(self.names)
+
+
+variable_registry = VariableRegistry()
+
+
 class Polynomial(Immutable, AlgebraicStructure):
 	"Polynomials over rings and fields."
 	
@@ -195,7 +257,9 @@ class Polynomial(Immutable, AlgebraicStructure):
 		return self.cached_algebra
 	
 	@classmethod
-	def var(cls, name, base_ring):
+	def var(cls, name, base_ring, kind=None, time=None, index=None):
+		"Variable named `name`. The optional `kind`, `time` and `index` are recorded in `variable_registry`."
+		
 		try:
 			return cls.var_cache[base_ring][name]
 		except KeyError:
@@ -203,6 +267,7 @@ class Polynomial(Immutable, AlgebraicStructure):
 			if not base_ring in cls.var_cache:
 				cls.var_cache[base_ring] = dict()
 		
+		variable_registry.register(name, kind, time, index)
 		result = cls(cls.symbol.var, [name, base_ring], base_ring=base_ring)
 		result.is_canonical = True
 		result.is_optimized = True
@@ -770,18 +835,27 @@ class Polynomial(Immutable, AlgebraicStructure):
 		else:
 			raise RuntimeError
 	
-	def __traverse_subterms(self, transform):
+	def __traverse_subterms(self, transform, cache=None):
+		if cache is None:
+			cache = {}
+		
+		try:
+			return cache[id(self)] # shared subterms are transformed once and stay shared in the result
+		except KeyError:
+			pass
+		
 		if self.operator == self.symbol.add:
-			candidate = self.algebra.sum([_subterm.__traverse_subterms(transform) for _subterm in self.operands])
+			candidate = self.algebra.sum([_subterm.__traverse_subterms(transform, cache) for _subterm in self.operands])
 		elif self.operator == self.symbol.mul:
-			candidate = self.algebra.product([_subterm.__traverse_subterms(transform) for _subterm in self.operands])
+			candidate = self.algebra.product([_subterm.__traverse_subterms(transform, cache) for _subterm in self.operands])
 		elif self.operator == self.symbol.sub:
-			left, right = [_subterm.__traverse_subterms(transform) for _subterm in self.operands]
+			left, right = [_subterm.__traverse_subterms(transform, cache) for _subterm in self.operands]
 			candidate = left - right
 		else:
 			candidate = self
 		
-		return transform(candidate)
+		result = cache[id(self)] = transform(candidate)
+		return result
 	
 	def __optimize_smallest(self, terms):
 		smallest = self
@@ -1176,6 +1250,102 @@ class Polynomial(Immutable, AlgebraicStructure):
 			self.variables_cache = result
 			return result
 	
+	@property
+	def variable_id(self):
+		"Id of the variable in `variable_registry`. Only for polynomials being a single variable."
+		if self.operator != self.symbol.var:
+			raise ValueError("Not a variable.")
+		return variable_registry.register(self.operands[0])
+	
+	def substitute_variables(self, substitution, cache=None):
+		"""
+		Substitute variables, matched by id in `variable_registry`, with the values from the dict `substitution`.
+		Shared subterms are processed once; pass the same `cache` dict when substituting in many polynomials.
+		"""
+		
+		if cache is None:
+			cache = {}
+		
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
+		if self.operator == self.symbol.const:
+			result = self
+		elif self.operator == self.symbol.var:
+			try:
+				result = substitution[self.variable_id]
+			except KeyError:
+				result = self
+			else:
+				if (result.algebra != self.algebra) and (self.algebra.base_ring != result.algebra):
+					raise ValueError("Substituted value must be from the same algebra as the original polynomial. ({} vs. {})".format(str(self.algebra), str(result.algebra)))
+				if not hasattr(result, 'operator'):
+					result = self.const(result)
+		else:
+			operands = [_op.substitute_variables(substitution, cache) for _op in self.operands]
+			if all(_new is _old for (_new, _old) in zip(operands, self.operands)):
+				result = self
+			else:
+				# identical rebuilt subterms become the same node, so the result is a DAG
+				key = self.operator, tuple(id(_op) for _op in operands)
+				try:
+					result = cache[key]
+				except KeyError:
+					result = self.algebra(self.operator, operands)
+					cache[key] = result
+		
+		cache[id(self)] = result
+		return result
+	
+	def structural_degree(self, cache=None):
+		"Upper bound of the algebraic degree, read from the expression structure (terms that cancel out are not detected)."
+		
+		if cache is None:
+			cache = {}
+		
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
+		if self.operator == self.symbol.const:
+			result = 0
+		elif self.operator == self.symbol.var:
+			result = 1
+		elif self.operator == self.symbol.mul:
+			result = sum(_op.structural_degree(cache) for _op in self.operands)
+		else:
+			result = max((_op.structural_degree(cache) for _op in self.operands), default=0)
+		
+		cache[id(self)] = result
+		return result
+	
+	def dag_size(self, visited=None):
+		"Circuit size counting every distinct node (by identity) once, as opposed to `circuit_size` that counts the expression tree. Pass the same `visited` set to count shared nodes of many polynomials once."
+		
+		if visited is None:
+			visited = set()
+		
+		size = 0
+		stack = [self]
+		while stack:
+			node = stack.pop()
+			if id(node) in visited:
+				continue
+			visited.add(id(node))
+			
+			if node.operator == self.symbol.var:
+				size += 1
+			elif node.operator in (self.symbol.add, self.symbol.sub, self.symbol.mul):
+				size += len(node.operands) - 1
+				stack.extend(node.operands)
+			elif node.operator == self.symbol.neg:
+				size += 1
+				stack.extend(node.operands)
+		return size
+	
 	def variable_occurrences(self, v):
 		if self.operator == self.symbol.const:
 			return 0
@@ -1552,6 +1722,66 @@ class Polynomial(Immutable, AlgebraicStructure):
 		return result
 	
 	search_variables_limit = 8
+	search_valuations_limit = 1 << 24 # exhaustive search only up to this many valuations, large rings are searched randomly
+	
+	search_probe_cache = dict()
+	search_probe_cache_size = 64 # compiled search kernels kept alive
+	
+	def search_probe(self):
+		"""
+		Search kernel of the polynomial, `probe(count, seed, target)`, calling the compiled polynomial from native code (see `jit_types.Compiler.declare_search_function`).
+		Returns 0 if the polynomial evaluates to the int `target` on all tested valuations. One probe per polynomial is shared by `is_zero` and `is_one`.
+		"""
+		
+		key = Identical(self)
+		try:
+			return self.search_probe_cache[key]
+		except KeyError:
+			pass
+		
+		import ctypes
+		from jit_types import Compiler, search_kernel
+		compiler = Compiler()
+		self.compile('evaluate', compiler)
+		evaluate = compiler.defined_functions['evaluate']
+		code = compiler.compile(shared=True)
+		address = ctypes.cast(code.symbol['evaluate'], ctypes.c_void_p).value
+		search = search_kernel(len(evaluate.args), evaluate.function_type.return_type.width, self.algebra.base_ring.size)
+		
+		def probe(count, seed, target):
+			with code:
+				return search(address, count, seed, target)
+		probe.code = code
+		
+		if len(self.search_probe_cache) >= self.search_probe_cache_size:
+			del self.search_probe_cache[next(iter(self.search_probe_cache))]
+		self.search_probe_cache[key] = probe
+		return probe
+	
+	def __search_valuations(self, target, likely):
+		"""
+		Look for a valuation where the polynomial is not equal to `target` (0 or 1): exhaustively if there are at most `search_variables_limit` variables and `search_valuations_limit` valuations,
+		else on random valuations unless the equality is `likely`. Returns `False` if found, `True` if all valuations have been checked, `None` if undecided.
+		"""
+		
+		variables_count = len(self.variables())
+		ring_size = self.algebra.base_ring.size
+		
+		if variables_count <= self.search_variables_limit and ring_size ** variables_count <= self.search_valuations_limit: # exhaustive search
+			return not self.search_probe()(ring_size ** variables_count, 0, target)
+		elif likely:
+			return None
+		
+		size = self.dag_size() # shared subterms counted once, the tree size of a DAG may be exponential
+		if size >= 128 and ring_size <= 1 << 64: # random search in compiled code, the kernel counts in 64 bits
+			return False if self.search_probe()(size // 16, randbelow((1 << 64) - 1) + 1, target) else None
+		else: # random search
+			for n in range(size // 16):
+				s = {str(_v):self.algebra.random() for _v in self.variables()}
+				value = self(**s).evaluate()
+				if not (value.is_one() if target else value.is_zero()):
+					return False
+			return None
 	
 	def is_zero(self, likely_zero=False):
 		key = Identical(self)
@@ -1574,34 +1804,10 @@ class Polynomial(Immutable, AlgebraicStructure):
 		except ValueError:
 			pass
 		
-		if (not likely_zero and self.circuit_size() >= 128) or len(self.variables()) <= self.search_variables_limit:
-			from jit_types import Compiler
-			compiler = Compiler()
-			self.compile('c', compiler)
-			code = compiler.compile()
-			c = self.wrap_compiled('c', code)
-		else:
-			c = self
-			code = DummyContext()
-		
-		if len(self.variables()) <= self.search_variables_limit: # exhaustive search
-			with code:
-				vs = [str(_v) for _v in self.variables()]
-				for valuation in product(*[self.algebra.domain() for _n in range(len(self.variables()))]):
-					s = dict(zip(vs, valuation))
-					if not c(**s).evaluate().is_zero():
-						self.is_zero_cache[key] = False
-						return False
-				else:
-					self.is_zero_cache[key] = True
-					return True
-		elif not likely_zero: # random search
-			with code:
-				for n in range(self.circuit_size() // 16):
-					s = {str(_v):self.algebra.random() for _v in self.variables()}
-					if not c(**s).evaluate().is_zero():
-						self.is_zero_cache[key] = False
-						return False
+		result = self.__search_valuations(0, likely_zero)
+		if result is not None:
+			self.is_zero_cache[key] = result
+			return result
 		
 		if self.circuit_size() <= 32: # small circuit, try algebraic proof
 			try:
@@ -1686,34 +1892,10 @@ class Polynomial(Immutable, AlgebraicStructure):
 		except ValueError:
 			pass
 		
-		if (not likely_one and self.circuit_size() >= 128) or len(self.variables()) <= self.search_variables_limit:
-			from jit_types import Compiler
-			compiler = Compiler()
-			self.compile('c', compiler)
-			code = compiler.compile()
-			c = self.wrap_compiled('c', code)
-		else:
-			c = self
-			code = DummyContext()
-		
-		if len(self.variables()) <= self.search_variables_limit: # exhaustive search
-			with code:
-				vs = [str(_v) for _v in self.variables()]
-				for valuation in product(*[self.algebra.domain() for _n in range(len(self.variables()))]):
-					s = dict(zip(vs, valuation))
-					if not c(**s).evaluate().is_one():
-						self.is_one_cache[key] = False
-						return False
-				else:
-					self.is_one_cache[key] = True
-					return True
-		elif not likely_one: # random search
-			with code:
-				for n in range(self.circuit_size() // 16):
-					s = {str(_v):self.algebra.random() for _v in self.variables()}
-					if not c(**s).evaluate().is_one():
-						self.is_one_cache[key] = False
-						return False
+		result = self.__search_valuations(1, likely_one)
+		if result is not None:
+			self.is_one_cache[key] = result
+			return result
 		
 		if self.circuit_size() <= 32: # small circuit, try algebraic proof
 			try:
@@ -1822,6 +2004,87 @@ class Polynomial(Immutable, AlgebraicStructure):
 		else:
 			raise RuntimeError("Unsupported operator: {}.".format(str(self.operator)))
 	
+	def evaluate_slots(self, slots, values, cache=None):
+		"""
+		Evaluate the polynomial, taking the value of every variable from the flat array `values` at the position `slots[name]`.
+		Shared subterms are evaluated only once. Pass the same `cache` dict when evaluating many polynomials on the same valuation.
+		"""
+		
+		if cache is None:
+			cache = {}
+		
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
+		if self.operator == self.symbol.var:
+			result = values[slots[self.operands[0]]]
+		elif self.operator == self.symbol.const:
+			result = self.evaluate()
+		elif self.operator == self.symbol.add:
+			if self.operands:
+				result = reduce(operator.add, [_op.evaluate_slots(slots, values, cache) for _op in self.operands])
+			else:
+				result = self.algebra.base_ring.zero()
+		elif self.operator == self.symbol.mul:
+			if self.operands:
+				result = reduce(operator.mul, [_op.evaluate_slots(slots, values, cache) for _op in self.operands])
+			else:
+				result = self.algebra.base_ring.one()
+		elif self.operator == self.symbol.sub:
+			assert len(self.operands) == 2
+			result = self.operands[0].evaluate_slots(slots, values, cache) - self.operands[1].evaluate_slots(slots, values, cache)
+		elif self.operator == self.symbol.neg:
+			assert len(self.operands) == 1
+			result = -self.operands[0].evaluate_slots(slots, values, cache)
+		else:
+			raise RuntimeError("Unsupported operator: {}.".format(str(self.operator)))
+		
+		cache[id(self)] = result
+		return result
+	
+	def evaluate_bitsliced(self, slots, words, mask, cache=None):
+		"""
+		Evaluate the polynomial over a ring of size 2 on many valuations at once. Bit `k` of the integer `words[slots[name]]` is the value of the variable in the valuation `k`.
+		Addition and subtraction are XOR, multiplication is AND, constant one is `mask`. Returns the integer with the results for all valuations.
+		"""
+		
+		if self.algebra.base_ring.size != 2:
+			raise ValueError("Bitsliced evaluation requires a ring of size 2.")
+		
+		if cache is None:
+			cache = {}
+		
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
+		if self.operator == self.symbol.var:
+			result = words[slots[self.operands[0]]]
+		elif self.operator == self.symbol.const:
+			result = mask if int(self.evaluate()) else mask ^ mask # zero of the same type as the words
+		elif self.operator == self.symbol.add or self.operator == self.symbol.sub:
+			result = 0
+			for operand in self.operands:
+				result ^= operand.evaluate_bitsliced(slots, words, mask, cache)
+		elif self.operator == self.symbol.mul:
+			result = mask
+			for operand in self.operands:
+				value = operand.evaluate_bitsliced(slots, words, mask, cache)
+				if isinstance(value, int) and not value:
+					result = value
+					break
+				result &= value
+		elif self.operator == self.symbol.neg:
+			result = self.operands[0].evaluate_bitsliced(slots, words, mask, cache)
+		else:
+			raise RuntimeError("Unsupported operator: {}.".format(str(self.operator)))
+		
+		cache[id(self)] = result
+		return result
+	
 	def is_jit(self):
 		return (self.operator == self.symbol.const) and len(self.operands) >= 1 and self.operands[0].is_jit()
 	
@@ -1841,15 +2104,217 @@ class Polynomial(Immutable, AlgebraicStructure):
 			bl = self.algebra.exponent
 		except AttributeError:
 			bl = (self.algebra.base_ring.size - 1).bit_length()
-		bits = (8 * ((bl - 1) // 8 + 1)) if bl > 1 else 8
+		bits = 1 << (bl - 1).bit_length() if bl > 8 else 8 # as `jit_types.Integer.round_8`: 8, 16, 32, 64 or 128
+		
+		ring = self.algebra.base_ring
+		
+		if ring.size == 2:
+			wrap = unwrap = lambda _value: _value
+		else:
+			wrap = ring
+			def unwrap(result):
+				try:
+					return result.ring_value
+				except AttributeError:
+					return result.binary_field_value
+		
+		self.compile_parts(name, compiler, bits, sorted_vars, lambda _node, _arguments, _cache: _node.emit_jit(_arguments, _cache), unwrap, wrap)
+	
+	compile_node_budget = 4096 # compile polynomials of more operations as parts of about this size, see `partition`; `None` to compile everything in one function
+	
+	def partition(self, budget):
+		"""
+		Split the polynomial DAG into parts of at most about `budget` operations, to be compiled as separate functions. Returns the list of parts in evaluation order,
+		every part being a list of pairs `(subterm, body)` in evaluation order, `body` computing `subterm` (the last one is the whole polynomial).
+		The distinct subterms are cut in the order of a depth-first traversal, so that the values passed between the parts are mostly the shared subterms;
+		sums and products of more than `budget` operands are regrouped into nested ones.
+		"""
+		
+		if budget < 2:
+			raise ValueError("The budget must be at least 2 operations.")
+		
+		leaf = (self.symbol.var, self.symbol.const)
+		
+		order = [] # distinct operations, operands first
+		visited = set()
+		stack = [(self, False)]
+		while stack:
+			node, expanded = stack.pop()
+			if expanded:
+				order.append(node)
+				continue
+			if id(node) in visited or node.operator in leaf:
+				continue
+			visited.add(id(node))
+			stack.append((node, True))
+			stack.extend((_op, False) for _op in reversed(node.operands))
+		
+		if not order:
+			return [[(self, self)]]
+		
+		parts = [[]]
+		size = 0
+		for node in order:
+			items = []
+			operands = node.operands
+			while len(operands) > budget and node.operator in (self.symbol.add, self.symbol.mul):
+				grouped = []
+				for group in (operands[_n:_n + budget] for _n in range(0, len(operands), budget)):
+					if len(group) == 1:
+						grouped.append(group[0])
+					else:
+						chunk = self.__class__(node.operator, group)
+						items.append((chunk, chunk))
+						grouped.append(chunk)
+				operands = grouped
+			items.append((node, node if operands is node.operands else self.__class__(node.operator, operands)))
+			
+			for subterm, body in items:
+				if size + len(body.operands) > budget and parts[-1]:
+					parts.append([])
+					size = 0
+				parts[-1].append((subterm, body))
+				size += len(body.operands)
+		
+		return parts
+	
+	def compile_parts(self, name, compiler, bits, sorted_vars, emit, unwrap, wrap):
+		"""
+		Define the function `name` of the variables `sorted_vars` computing `emit(self, arguments, cache)`, where `emit` is the JIT emitter of a node
+		(`emit_jit` or `evaluate_bitsliced`), `arguments` maps variable names to its values and `cache` maps `id` of nodes to their values.
+		The arguments are converted to emitter values by `wrap` and the result back by `unwrap`. Polynomials larger than `compile_node_budget` are split
+		by `partition`, every part being an internal function `name.n` (see `jit_types.Compiler.declare_frame_function`); the function `name` just stores
+		the arguments into a frame and calls the parts in order, which load the values they use from the frame and store the values used by the later parts.
+		"""
+		
+		parts = [[(self, self)]] if self.compile_node_budget is None else self.partition(self.compile_node_budget)
+		
+		if len(parts) == 1:
+			@compiler.function(name=name, bits=bits, arg_count=len(sorted_vars))
+			def evaluate_polynomial(*args):
+				return unwrap(emit(self, dict(zip(sorted_vars, [wrap(_arg) for _arg in args])), {}))
+			return
+		
+		from jit_types import Frame
+		
+		owner = dict((id(_node), _n) for (_n, _part) in enumerate(parts) for (_node, _body) in _part)
+		slot = dict((_var, _n) for (_n, _var) in enumerate(sorted_vars)) # variable names and `id` of the subterms passed between the parts
+		loads = []
+		for n, part in enumerate(parts):
+			part_loads = {}
+			for node, body in part:
+				for operand in body.operands:
+					if operand.operator == self.symbol.var:
+						part_loads[operand.operands[0]] = None
+					elif operand.operator != self.symbol.const and owner[id(operand)] != n:
+						part_loads[id(operand)] = None
+						slot.setdefault(id(operand), len(slot))
+			loads.append(list(part_loads))
+		slot[id(self)] = len(slot)
+		
+		functions = []
+		for n, (part, part_loads) in enumerate(zip(parts, loads)):
+			def evaluate_part(frame, part=part, part_loads=part_loads):
+				arguments = {}
+				cache = {}
+				for key in part_loads:
+					(arguments if isinstance(key, str) else cache)[key] = wrap(frame[slot[key]])
+				for node, body in part:
+					cache[id(node)] = value = emit(body, arguments, cache)
+					if id(node) in slot:
+						frame[slot[id(node)]] = unwrap(value)
+			functions.append(compiler.declare_frame_function(f'{name}.{n}', bits, evaluate_part))
 		
 		@compiler.function(name=name, bits=bits, arg_count=len(sorted_vars))
 		def evaluate_polynomial(*args):
-			result = self(**dict(zip(sorted_vars, [self.algebra.const(_arg) for _arg in args]))).evaluate()
-			try:
-				return result.ring_value
-			except AttributeError:
-				return result.binary_field_value
+			frame = Frame.allocate(bits, len(slot))
+			for n, arg in enumerate(args):
+				frame[n] = arg
+			for function in functions:
+				function(frame)
+			return frame[slot[id(self)]]
+	
+	def emit_jit(self, arguments, cache=None):
+		"""
+		Emit the code computing the polynomial into the current JIT function, the value of every variable being `arguments[name]`.
+		Every node is emitted once, shared subterms reuse the emitted value. Over a ring of size 2 the arguments are JIT integers
+		combined by XOR and AND directly, otherwise they are ring elements wrapping JIT integers and the ring arithmetic is used.
+		"""
+		
+		if cache is None:
+			cache = {}
+		
+		try:
+			return cache[id(self)]
+		except KeyError:
+			pass
+		
+		boolean = self.algebra.base_ring.size == 2
+		
+		if self.operator == self.symbol.var:
+			result = arguments[self.operands[0]]
+		elif self.operator == self.symbol.const:
+			result = int(self.evaluate()) if boolean else self.evaluate()
+		elif boolean and self.operator in (self.symbol.add, self.symbol.sub, self.symbol.mul):
+			add = self.operator != self.symbol.mul
+			constant = 0 if add else 1
+			result = None
+			for operand in self.operands:
+				value = operand.emit_jit(arguments, cache)
+				if isinstance(value, int):
+					constant = (constant ^ value) if add else (constant & value)
+				elif result is None:
+					result = value
+				else:
+					result = (result ^ value) if add else (result & value)
+			if result is None or (not add and not constant):
+				result = constant
+			elif add and constant:
+				result = result ^ 1
+		elif self.operator == self.symbol.add:
+			result = self.algebra.base_ring.zero()
+			for operand in self.operands:
+				value = operand.emit_jit(arguments, cache)
+				if value.is_jit() or not value.is_zero():
+					result = value if (not result.is_jit() and result.is_zero()) else result + value
+		elif self.operator == self.symbol.mul:
+			result = self.algebra.base_ring.one()
+			for operand in self.operands:
+				value = operand.emit_jit(arguments, cache)
+				if value.is_jit():
+					result = value if (not result.is_jit() and result.is_one()) else result * value
+				elif value.is_zero():
+					result = value
+					break
+				elif not value.is_one():
+					result = result * value
+		elif self.operator == self.symbol.sub:
+			assert len(self.operands) == 2
+			result = self.operands[0].emit_jit(arguments, cache) - self.operands[1].emit_jit(arguments, cache)
+		elif self.operator == self.symbol.neg:
+			assert len(self.operands) == 1
+			result = self.operands[0].emit_jit(arguments, cache)
+			if not boolean:
+				result = -result
+		else:
+			raise RuntimeError("Unsupported operator: {}.".format(str(self.operator)))
+		
+		cache[id(self)] = result
+		return result
+	
+	def compile_bitsliced(self, name, compiler, bits=64):
+		"Compile the bitsliced evaluator (see `evaluate_bitsliced`) to a function taking and returning `bits`-wide words, one argument per variable in sorted order."
+		
+		if self.algebra.base_ring.size != 2:
+			raise ValueError("Bitsliced evaluation requires a ring of size 2.")
+		
+		from jit_types import Integer
+		
+		sorted_vars = sorted([str(_var) for _var in self.variables()])
+		mask = Integer((1 << bits) - 1) # constants of the word type, see `evaluate_bitsliced`
+		
+		slots = dict((_v, _v) for _v in sorted_vars)
+		self.compile_parts(name, compiler, bits, sorted_vars, lambda _node, _arguments, _cache: _node.evaluate_bitsliced(slots, _arguments, mask, _cache), lambda _value: _value, lambda _value: _value)
 	
 	def wrap_compiled(self, name, code):
 		compiled = code.symbol[name]
@@ -1860,6 +2325,16 @@ class Polynomial(Immutable, AlgebraicStructure):
 		wrapped.__name__ = name
 		return wrapped
 
+	def wrap_compiled_slots(self, name, code, slots):
+		"Like `wrap_compiled`, but the returned function takes a flat array of ints `values`, the argument for each variable being `values[slots[name]]`."
+		compiled = code.symbol[name]
+		indices = [slots[_var] for _var in sorted([str(_var) for _var in self.variables()])]
+		ring = self.algebra.base_ring
+		def wrapped(values):
+			return ring(compiled(*[values[_i] for _i in indices]))
+		wrapped.__name__ = name
+		return wrapped
+
 
 if __debug__:
 	import pickle
@@ -2067,9 +2542,136 @@ if __debug__:
 				assert po == p
 			assert p.circuit_size() >= po.circuit_size()
 	
+	def test_compile(algebra, verbose=False):
+		"Compare compiled polynomials with `evaluate_slots`, including a DAG with shared subterms."
+		
+		from jit_types import Compiler
+		
+		Ring = algebra.base_ring
+		v = [algebra.var('v_' + str(_n)) for _n in range(8)]
+		slots = dict((str(_v), _n) for (_n, _v) in enumerate(v))
+		
+		compiler = Compiler()
+		if hasattr(Ring, 'compile_tables'):
+			Ring.compile_tables(str(Ring.algebra_name), compiler)
+		
+		polynomials = []
+		for i in range(4):
+			p = algebra.random(variables=v, order=4)
+			q = p * p - v[0] + p
+			polynomials.extend([p, q * q + q * v[1], -q])
+		for n, p in enumerate(polynomials):
+			p.compile(f'p_{n}', compiler)
+		code = compiler.compile()
+		
+		with code:
+			for n, p in enumerate(polynomials):
+				pc = p.wrap_compiled_slots(f'p_{n}', code, slots)
+				for k in range(16):
+					values = [Ring.random() for _v in v]
+					assert pc([int(_x) for _x in values]) == p.evaluate_slots(slots, values)
+		if verbose: print(" compiled", len(polynomials), "polynomials")
+	
+	def test_partition(algebra, budget=16, verbose=False):
+		"Compile polynomials split into parts of `budget` operations and compare them with `evaluate_slots`; over a ring of size 2, also the bitsliced evaluators."
+		
+		from jit_types import Compiler
+		
+		Ring = algebra.base_ring
+		v = [algebra.var('v_' + str(_n)) for _n in range(8)]
+		slots = dict((str(_v), _n) for (_n, _v) in enumerate(v))
+		
+		w = list(v)
+		for r in range(6): # mixing rounds, every subterm used twice
+			w = [w[_n] * w[(_n + 1) % len(w)] + w[(_n + 3) % len(w)] for _n in range(len(w))]
+		polynomials = [algebra.sum(w, base_ring=Ring), algebra.sum(w[:3], base_ring=Ring) * w[4] - w[5], algebra.sum(v * (2 * budget + 3), base_ring=Ring), algebra.random(variables=v, order=3)]
+		zero = algebra.zero()
+		polynomials.append(Polynomial(Polynomial.symbol.add, [Polynomial(Polynomial.symbol.mul, [v[0], v[1], zero]), v[2], Polynomial(Polynomial.symbol.mul, [zero, v[3]]), zero])) # unsimplified zero constants
+		
+		for p in polynomials:
+			parts = p.partition(budget)
+			assert parts[-1][-1][0] is p
+			assert all(sum(len(_body.operands) for (_node, _body) in _part) <= budget or len(_part) == 1 for _part in parts)
+			if verbose: print(" partition:", p.dag_size(), "nodes in", len(parts), "parts")
+		
+		compile_node_budget = Polynomial.compile_node_budget
+		try:
+			Polynomial.compile_node_budget = budget
+			compiler = Compiler()
+			if hasattr(Ring, 'compile_tables'):
+				Ring.compile_tables(str(Ring.algebra_name), compiler)
+			for n, p in enumerate(polynomials):
+				p.compile(f'p_{n}', compiler)
+				if Ring.size == 2:
+					p.compile_bitsliced(f'b_{n}', compiler)
+			code = compiler.compile()
+		finally:
+			Polynomial.compile_node_budget = compile_node_budget
+		
+		with code:
+			for n, p in enumerate(polynomials):
+				pc = p.wrap_compiled_slots(f'p_{n}', code, slots)
+				for k in range(16):
+					values = [Ring.random() for _v in v]
+					assert pc([int(_x) for _x in values]) == p.evaluate_slots(slots, values)
+				if Ring.size == 2:
+					bc = code.symbol[f'b_{n}']
+					words = dict((str(_v), randbelow(1 << 64)) for _v in v)
+					assert bc(*[words[_name] for _name in sorted(str(_v) for _v in p.variables())]) == p.evaluate_bitsliced(dict((_name, _name) for _name in words), words, (1 << 64) - 1)
+		if verbose: print(" compiled", len(polynomials), "partitioned polynomials")
+	
+	def test_search(algebra, verbose=False):
+		"Compare the compiled search kernel with the evaluation on all valuations in the modular Gray code order."
+		
+		Ring = algebra.base_ring
+		size = Ring.size
+		v = [algebra.var('v_' + str(_n)) for _n in range(3)]
+		names = [str(_v) for _v in v]
+		
+		polynomials = [v[0] * v[1] * v[2], v[0] * v[1] + v[2] * v[2] * v[1]] + [algebra.random(variables=v, order=3) for _n in range(4)]
+		for p in polynomials:
+			if len(p.variables()) != len(v): continue
+			probe = p.search_probe()
+			assert p.search_probe() is probe
+			for target in 0, 1:
+				expected = 0
+				for n in range(size ** len(v)):
+					digits = [(n // size ** _k) % size for _k in range(len(v))] + [0]
+					valuation = dict(zip(names, [Ring((digits[_k] - digits[_k + 1]) % size) for _k in range(len(v))]))
+					if int(p(**valuation).evaluate()) != target:
+						expected = n + 1
+						break
+				assert probe(size ** len(v), 0, target) == expected
+			assert p.is_zero() == (probe(size ** len(v), 0, 0) == 0)
+		
+		p = v[0] * v[1] * v[2]
+		assert p.search_probe()(1000, 12345, 0) # random search
+		if size == 2:
+			assert not (p - p * v[0] * v[0]).search_probe()(1000, 12345, 0) # identically zero
+		if verbose: print(" searched", len(polynomials), "polynomials")
+	
 	def polynomial_test_suite(verbose=False):
 		if verbose: print("running test suite")
 		
+		# compiled code first, some of the legacy checks below fail (see `test_polynomial`)
+		try:
+			import jit_types
+		except ImportError:
+			pass
+		else:
+			for i in (251, 65537, 2**32 - 5, 2**32, 2**64 - 59, 2**64, 2**127 - 1, 2**128): # residues of 8 to 128 bits, wrapping around for powers of 2
+				if verbose: print()
+				if verbose: print("test compiled Polynomial(base_ring=ModularRing(size={}))".format(i))
+				test_compile(Polynomial.get_algebra(base_ring=ModularRing.get_algebra(size=i)), verbose)
+			for Ring in (BooleanRing.get_algebra(), ModularRing.get_algebra(size=65537), ModularRing.get_algebra(size=2**127 - 1)):
+				if verbose: print()
+				if verbose: print("test partitioned Polynomial(base_ring={})".format(Ring))
+				test_partition(Polynomial.get_algebra(base_ring=Ring), verbose=verbose)
+			for Ring in (BooleanRing.get_algebra(), ModularRing.get_algebra(size=5), BinaryField.get_algebra(exponent=4, reducing_polynomial=(1, 0, 0, 1, 1))):
+				if verbose: print()
+				if verbose: print("test search kernel Polynomial(base_ring={})".format(Ring))
+				test_search(Polynomial.get_algebra(base_ring=Ring), verbose)
+		
 		for i in chain(range(2, 16), (2**_i for _i in range(5, 9))):
 			ring = ModularRing.get_algebra(size=i)
 			if verbose: print()
@@ -2134,7 +2736,7 @@ if __debug__:
 		if verbose: print(" optimization test")
 		test_optimization(ring_polynomial)
 	
-	__all__ = __all__ + ('test_polynomial', 'test_optimization', 'polynomial_test_suite')
+	__all__ = __all__ + ('test_polynomial', 'test_optimization', 'test_compile', 'test_partition', 'test_search', 'polynomial_test_suite')
 
 
 if __debug__ and __name__ == '__main__':
@@ -224,7 +224,10 @@ class ModularRing(AbstractRing):
 		try:
 			ring_value = value.ring_value
 		except AttributeError:
-			ring_value = value % size
+			if hasattr(value, 'jit_value'):
+				ring_value = self.jit_operation('reduce', size, value)
+			else:
+				ring_value = value % size
 		
 		if not hasattr(self, 'ring_value'):
 			self.ring_value = ring_value
@@ -237,6 +240,15 @@ class ModularRing(AbstractRing):
 	def is_jit(self):
 		return hasattr(self.ring_value, 'jit_value')
 	
+	@staticmethod
+	def jit_operation(operation, size, *operands):
+		"""
+		Arithmetic modulo `size` in compiled code, see `jit_types.modular_reduce`, `modular_add`, `modular_subtract`, `modular_negate` and `modular_multiply`.
+		Residues are kept in 8, 16, 32, 64 or 128 bits without overflow; if `size` is a power of 2 the native arithmetic wraps around.
+		"""
+		import jit_types
+		return getattr(jit_types, 'modular_' + operation)(*operands, size)
+	
 	def __int__(self):
 		return int(self.ring_value)
 	
@@ -244,6 +256,8 @@ class ModularRing(AbstractRing):
 		try:
 			if self.algebra != other.algebra:
 				return NotImplemented
+			if self.is_jit() or other.is_jit():
+				return self.algebra(self.jit_operation('add', self.algebra.size, self.ring_value, other.ring_value))
 			return self.algebra((self.ring_value + other.ring_value) % self.algebra.size)
 		except AttributeError:
 			return NotImplemented
@@ -252,17 +266,23 @@ class ModularRing(AbstractRing):
 		try:
 			if self.algebra != other.algebra:
 				return NotImplemented
+			if self.is_jit() or other.is_jit():
+				return self.algebra(self.jit_operation('subtract', self.algebra.size, self.ring_value, other.ring_value))
 			return self.algebra((self.algebra.size + self.ring_value - other.ring_value) % self.algebra.size)
 		except AttributeError:
 			return NotImplemented
 	
 	def __neg__(self):
+		if self.is_jit():
+			return self.algebra(self.jit_operation('negate', self.algebra.size, self.ring_value))
 		return self.algebra((self.algebra.size - self.ring_value) % self.algebra.size)
 	
 	def __mul__(self, other):
 		try:
 			if self.algebra != other.algebra:
 				return NotImplemented
+			if self.is_jit() or other.is_jit():
+				return self.algebra(self.jit_operation('multiply', self.algebra.size, self.ring_value, other.ring_value))
 			return self.algebra((self.ring_value * other.ring_value) % self.algebra.size)
 		except AttributeError:
 			return NotImplemented
@@ -860,6 +880,7 @@ class GaloisField(AbstractRing):
 		"""
 		Compile exponent and logarithm tables. If this method is called, compiled circuits will use slipstick multiplication.
 		If not, they will default to long multiplication. It varies between system which algorithm is faster.
+		Not needed for `BinaryField`, which always uses its native multiplication in compiled code.
 		"""
 		algebra = cls.get_algebra(*args, **kwargs)
 		log_table, exp_table = algebra.log_exp_tables()
@@ -1060,6 +1081,28 @@ class BinaryField(GaloisField):
 		assert one.is_jit() or two.is_jit() or 0 <= value < algebra.size
 		
 		return algebra(value)
+	
+	@staticmethod
+	def jit_multiplication(one, two):
+		"Multiplication in compiled code, lowered to a product table or a carry-less multiplication emitted once per module (see `jit_types.binary_field_multiplier`)."
+		
+		if one.algebra != two.algebra:
+			raise ValueError
+		
+		from jit_types import binary_field_multiply
+		algebra = one.algebra
+		return algebra(binary_field_multiply(one.binary_field_value, two.binary_field_value, algebra.exponent, algebra.reducing_polynomial_bitfield))
+	
+	def __mul__(self, other):
+		try:
+			if self.algebra != other.algebra:
+				return NotImplemented
+		except AttributeError:
+			return NotImplemented
+		
+		if self.is_jit() or other.is_jit():
+			return self.jit_multiplication(self, other)
+		return super().__mul__(other)
 
 
 # Rijndael field, used in AES encryption standard.
@@ -1208,6 +1251,31 @@ if __debug__:
 		#	if g.is_zero(): continue
 		#	assert Field.exp(g.log()) == g
 	
+	def test_jit_multiplication(Field):
+		"Compare the multiplication in compiled code with `long_multiplication` on all (or random) pairs of elements."
+		
+		from jit_types import Compiler
+		
+		bits = max(8, 1 << (Field.exponent - 1).bit_length())
+		three = Field(3)
+		
+		compiler = Compiler()
+		
+		@compiler.function(bits=bits)
+		def multiply(x, y):
+			return (Field(x) * Field(y) + Field(x) * three).binary_field_value
+		
+		code = compiler.compile()
+		multiply = code.symbol['multiply']
+		
+		if Field.size <= 256:
+			pairs = product(range(Field.size), repeat=2)
+		else:
+			pairs = [(randbelow(Field.size), randbelow(Field.size)) for _n in range(1000)]
+		
+		with code:
+			for x, y in pairs:
+				assert multiply(x, y) == int(BinaryField.long_multiplication(Field(x), Field(y)) + BinaryField.long_multiplication(Field(x), three))
 	
 	def rings_test_suite(verbose=False):
 		if verbose: print("running test suite")
@@ -1257,8 +1325,18 @@ if __debug__:
 		test_ring(field)
 		if verbose: print(" field test")
 		test_field(field)
+		
+		try:
+			import jit_types
+		except ImportError:
+			pass
+		else:
+			for field in RijndaelField, BinaryField.get_algebra(reducing_polynomial=(1, 0, 0, 1, 1)), BinaryField.get_algebra(reducing_polynomial=(1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 1)):
+				if verbose: print()
+				if verbose: print("test jit multiplication in BinaryField(exponent={})".format(field.exponent))
+				test_jit_multiplication(field)
 	
-	__all__ = __all__ + ('test_ring', 'test_field', 'rings_test_suite')
+	__all__ = __all__ + ('test_ring', 'test_field', 'test_jit_multiplication', 'rings_test_suite')
 
 
 if __debug__ and __name__ == '__main__':
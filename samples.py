@@ -1,7 +1,7 @@
 #!/usr/bin/python3 -O
 #-*- coding:utf8 -*-
 
-from jit_types import Compiler
+from jit_types import Compiler, object_cache
 from rings import BooleanRing
 from automaton import automaton_factory
 from pathlib import Path
@@ -244,39 +244,39 @@ def test_functional_encryption():
 	counting_homomorphic.compile('counting_homomorphic', compiler)
 	
 	code = compiler.compile()
-	encrypt_c = encrypt.wrap_compiled('encrypt', code)
-	decrypt_c = decrypt.wrap_compiled('decrypt', code)
-	counting_automaton_c = counting_automaton.wrap_compiled('counting_automaton', code)
-	counting_homomorphic_c = counting_homomorphic.wrap_compiled('counting_homomorphic', code)
+	encrypt_c = encrypt.wrap_compiled_stream('encrypt', code)
+	decrypt_c = decrypt.wrap_compiled_stream('decrypt', code)
+	counting_automaton_c = counting_automaton.wrap_compiled_stream('counting_automaton', code)
+	counting_homomorphic_c = counting_homomorphic.wrap_compiled_stream('counting_homomorphic', code)
 	
 	with code:
 		print()
 		print("testing plain automaton")
 		text = "12345678" + "ABCDabcdEFGHefgh" + "ABCD" # IV(4 * memory_size) + text + suffix(2 * memory_size)
 		print("text:\t\t", text)
-		t = [const_Vector(ord(_ch), 8) for _ch in text]
-		h = list(counting_automaton_c(t))
-		print("output:\t\t", ' '.join(['{:02x}'.format(int(_h)) for _h in h]))
+		t = text.encode()
+		h = counting_automaton_c(t)
+		print("output:\t\t", ' '.join(['{:02x}'.format(_h) for _h in h]))
 		
 		print()
 		print("testing FAPKC encryption/decryption")
 		print("text:\t\t", text)
-		e = list(encrypt_c(t))
-		print("cipher:\t\t", ' '.join(['{:02x}'.format(int(_e)) for _e in e]))
-		d = list(decrypt_c(e))
-		print("decrypted:\t", ''.join([chr(int(_d)) for _d in d]))
+		e = encrypt_c(t)
+		print("cipher:\t\t", ' '.join(['{:02x}'.format(_e) for _e in e]))
+		d = decrypt_c(e)
+		print("decrypted:\t", ''.join([chr(_d) for _d in d]))
 		
 		print()
 		print("testing functional encryption")
 		text = "123456" + "ABCDabcdEFGHefgh" + "ABCD7890" # IV(2 * memory_size) + prefix(memory_size) + text + suffix_1(2 * memory_size) + suffix_2(2 * memory_size)
 		print("text:\t\t", text)
-		t = [const_Vector(ord(_ch), 8) for _ch in text]
-		e = list(encrypt_c(t))
-		print("enc. input:\t", ' '.join(['{:02x}'.format(int(_e)) for _e in e]))
-		r = list(counting_homomorphic_c(e))
-		print("enc. output:\t", ' '.join(['{:02x}'.format(int(_r)) for _r in r]))
-		d = list(decrypt_c(r))
-		print("output:\t\t", ' '.join(['{:02x}'.format(int(_d)) for _d in d]))
+		t = text.encode()
+		e = encrypt_c(t)
+		print("enc. input:\t", ' '.join(['{:02x}'.format(_e) for _e in e]))
+		r = counting_homomorphic_c(e)
+		print("enc. output:\t", ' '.join(['{:02x}'.format(_r) for _r in r]))
+		d = decrypt_c(r)
+		print("output:\t\t", ' '.join(['{:02x}'.format(_d) for _d in d]))
 	print()
 
 
@@ -298,8 +298,8 @@ def test_homomorphic_encryption():
 	decrypt.compile('decrypt', compiler)
 	code1 = compiler.compile()
 	
-	encrypt_c = encrypt.wrap_compiled('encrypt', code1)
-	decrypt_c = decrypt.wrap_compiled('decrypt', code1)
+	encrypt_c = encrypt.wrap_compiled_stream('encrypt', code1)
+	decrypt_c = decrypt.wrap_compiled_stream('decrypt', code1)
 	
 	print()
 	print("testing FAPKC0 encryption / decryption")
@@ -307,12 +307,12 @@ def test_homomorphic_encryption():
 	cleartext = "caller: Request direct Denver for Northwest Three Twenty-eight."
 	print("text:\t\t", cleartext)
 	
-	cipher = [_r for _r in encrypt_c(const_Vector(ord(_ch), 8) for _ch in "%$" + cleartext + "!^")]
+	cipher = encrypt_c(("%$" + cleartext + "!^").encode())
 	
 	#print("".join([chr(int(_r)) if 32 <= int(_r) <= 127 else '?' for _r in cipher]))
 	
-	print("cipher:\t\t", ' '.join(['{:02x}'.format(int(_c)) for _c in cipher]))
-	text = "".join([chr(int(_r)) for _r in decrypt_c(cipher)][4:])
+	print("cipher:\t\t", ' '.join(['{:02x}'.format(_c) for _c in cipher]))
+	text = "".join([chr(_r) for _r in decrypt_c(cipher)][4:])
 	print("decrypted:\t", text)
 	
 	try:
@@ -372,26 +372,27 @@ def test_homomorphic_encryption():
 	compiler = Compiler()
 	lowercase_homomorphic.compile('lowercase_homomorphic', compiler)
 	code2 = compiler.compile()
-	lowercase_homomorphic_c = lowercase_homomorphic.wrap_compiled('lowercase_homomorphic', code2)
+	lowercase_homomorphic_c = lowercase_homomorphic.wrap_compiled_stream('lowercase_homomorphic', code2)
 	
 	print()
 	print("testing Gonzalez-Llamas homomorphic operations")
 	
 	print("text:\t\t\t", cleartext)
 	with code1:
-		cipher = [_r for _r in encrypt_c(const_Vector(ord(_ch), 8) for _ch in "A%$#" + cleartext + "!@^&")] # IV + text + suffix
-	print("cipher pre lowercase:\t", ' '.join(['{:02x}'.format(int(_c)) for _c in cipher]))
+		cipher = encrypt_c(("A%$#" + cleartext + "!@^&").encode()) # IV + text + suffix
+	print("cipher pre lowercase:\t", ' '.join(['{:02x}'.format(_c) for _c in cipher]))
 	with code2:
-		lowercase_cipher = [_r for _r in lowercase_homomorphic_c(cipher)]
-	print("cipher post lowercase:\t", ' '.join(['{:02x}'.format(int(_c)) for _c in lowercase_cipher]))
+		lowercase_cipher = lowercase_homomorphic_c(cipher)
+	print("cipher post lowercase:\t", ' '.join(['{:02x}'.format(_c) for _c in lowercase_cipher]))
 	with code1:
-		text = "".join([chr(int(_r)) for _r in decrypt_c(lowercase_cipher)][8:])
+		text = "".join([chr(_r) for _r in decrypt_c(lowercase_cipher)][8:])
 	print("decrypted:\t\t", text)
 	print()
 	
 
 if __name__ == '__main__':
-	test_homomorphic_encryption()
-	test_functional_encryption()
+	with object_cache(Path(__file__).parent / 'jit_cache'): # compiled automata are reused between runs, stored next to this script
+		test_homomorphic_encryption()
+		test_functional_encryption()
 
 
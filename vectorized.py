@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+#-*- coding:utf8 -*-
+
+
+import numpy
+
+
+__all__ = 'Program',
+
+
+class Program:
+	"""
+	Polynomials flattened to a list of instructions over registers, evaluated with NumPy on whole arrays of valuations at once.
+	Over a ring of size 2 the values are bitsliced `uint64` words (bit `k` of a word belongs to the valuation `k`, addition is XOR, multiplication is AND),
+	over `ModularRing` they are `uint64` residues. Registers `0 ... slots_count - 1` hold the variables (see `Polynomial.evaluate_slots`),
+	shared subterms are computed once and registers are released after their last use.
+	"""
+	
+	def __init__(self, polynomials, slots):
+		ring = polynomials[0].algebra.base_ring if polynomials else None
+		if ring is None or ring.size == 2:
+			self.modulus = None
+		elif ring.algebra_name == 'ModularRing' and ring.size <= (1 << 32):
+			self.modulus = ring.size
+		else:
+			raise ValueError(f"Vectorized evaluation is supported for rings of size 2 and modular rings up to 2**32, got: {ring}.")
+		
+		self.slots_count = max(slots.values(), default=-1) + 1
+		self.instructions = [] # (opcode, destination, sources)
+		self.constants = {} # register -> scalar
+		self.registers_count = self.slots_count
+		
+		registers = {}
+		self.outputs = [self.emit(_polynomial, slots, registers) for _polynomial in polynomials]
+		self.release()
+	
+	def constant(self, value):
+		"Allocate a register holding a scalar constant."
+		if self.modulus is None:
+			value = 0xffffffffffffffff if int(value) else 0
+		else:
+			value = int(value) % self.modulus
+		
+		for register, scalar in self.constants.items():
+			if scalar == value:
+				return register
+		register = self.registers_count
+		self.registers_count += 1
+		self.constants[register] = value
+		return register
+	
+	def emit(self, polynomial, slots, registers):
+		"Append the instructions computing `polynomial`, return the register holding the result."
+		
+		try:
+			return registers[id(polynomial)]
+		except KeyError:
+			pass
+		
+		symbol = polynomial.symbol
+		if polynomial.operator == symbol.var:
+			register = slots[polynomial.operands[0]]
+		elif polynomial.operator == symbol.const:
+			register = self.constant(polynomial.evaluate())
+		elif polynomial.operator in (symbol.add, symbol.sub, symbol.mul, symbol.neg):
+			sources = [self.emit(_operand, slots, registers) for _operand in polynomial.operands]
+			if polynomial.operator == symbol.mul and any(self.constants.get(_source, None) == 0 for _source in sources):
+				register = self.constant(0)
+			elif not sources:
+				register = self.constant(1 if polynomial.operator == symbol.mul else 0)
+			elif len(sources) == 1 and polynomial.operator != symbol.neg:
+				register = sources[0]
+			elif polynomial.operator == symbol.neg and self.modulus is None:
+				register = sources[0]
+			else:
+				register = self.registers_count
+				self.registers_count += 1
+				self.instructions.append((polynomial.operator.name, register, sources))
+		else:
+			raise RuntimeError("Unsupported operator: {}.".format(str(polynomial.operator)))
+		
+		registers[id(polynomial)] = register
+		return register
+	
+	def release(self):
+		"Annotate every instruction with the registers that are not used afterwards."
+		last_use = {}
+		for n, (opcode, destination, sources) in enumerate(self.instructions):
+			for source in sources:
+				last_use[source] = n
+		kept = frozenset(self.outputs) | frozenset(self.constants.keys())
+		released = [[] for _instruction in self.instructions]
+		for register, n in last_use.items():
+			if register >= self.slots_count and register not in kept:
+				released[n].append(register)
+		self.instructions = [_instruction + (tuple(_released),) for (_instruction, _released) in zip(self.instructions, released)]
+	
+	def __call__(self, values):
+		"""
+		Evaluate on the array `values` of shape `(slots_count, ...)`: `values[slot]` holds the values of the variable in all valuations.
+		Returns the array of shape `(len(polynomials), ...)`.
+		"""
+		
+		values = numpy.asarray(values, dtype=numpy.uint64)
+		if len(values) < self.slots_count:
+			raise ValueError(f"Expected at least {self.slots_count} variable rows, got {len(values)}.")
+		
+		registers = list(values[:self.slots_count]) + [None] * (self.registers_count - self.slots_count)
+		for register, scalar in self.constants.items():
+			registers[register] = numpy.uint64(scalar)
+		
+		modulus = self.modulus
+		if modulus is None:
+			for opcode, destination, sources, released in self.instructions:
+				if opcode == 'mul':
+					result = numpy.bitwise_and(registers[sources[0]], registers[sources[1]])
+					for source in sources[2:]:
+						result = numpy.bitwise_and(result, registers[source])
+				else: # add, sub
+					result = numpy.bitwise_xor(registers[sources[0]], registers[sources[1]])
+					for source in sources[2:]:
+						result = numpy.bitwise_xor(result, registers[source])
+				registers[destination] = result
+				for register in released:
+					registers[register] = None
+		else:
+			modulus = numpy.uint64(modulus)
+			for opcode, destination, sources, released in self.instructions:
+				if opcode == 'add':
+					result = registers[sources[0]]
+					for source in sources[1:]:
+						result = (result + registers[source]) % modulus
+				elif opcode == 'mul':
+					result = registers[sources[0]]
+					for source in sources[1:]:
+						result = (result * registers[source]) % modulus
+				elif opcode == 'sub':
+					result = registers[sources[0]]
+					for source in sources[1:]:
+						result = (result + modulus - registers[source]) % modulus
+				else: # neg
+					result = (modulus - registers[sources[0]]) % modulus
+				registers[destination] = result
+				for register in released:
+					registers[register] = None
+		
+		shape = values.shape[1:]
+		return numpy.array([numpy.broadcast_to(registers[_register], shape) for _register in self.outputs], dtype=numpy.uint64).reshape((len(self.outputs),) + shape)
+
+
+if __debug__:
+	from utils import randbelow
+	from rings import *
+	from polynomial import *
+	from linear import *
+	
+	def test_program(Ring, dimension, variables_count, order, batch):
+		"Compare the vectorized evaluation with `Polynomial.evaluate_slots`."
+		
+		print("Vectorized program test")
+		print(" algebra:", Ring, ", dimension:", dimension, ", variables:", variables_count, ", order:", order, ", batch:", batch)
+		
+		Polynomial_ = Polynomial.get_algebra(base_ring=Ring)
+		Vector_ = Vector.get_algebra(base_ring=Polynomial_)
+		variables = [Polynomial_.var(f'v_{_n}') for _n in range(variables_count)]
+		slots = dict((str(_v), _n) for (_n, _v) in enumerate(variables))
+		
+		vector = Vector_.random(dimension=dimension, variables=variables, order=order)
+		vector = Vector_([vector[0] * vector[1] - vector[2], -vector[0]] + list(vector))
+		program = vector.vectorize(slots)
+		
+		if Ring.size == 2:
+			words = numpy.array([[randbelow(1 << 64) for _k in range(batch)] for _n in range(variables_count)], dtype=numpy.uint64)
+			result = program(words)
+			assert result.shape == (len(vector), batch)
+			for k in range(batch):
+				mask = (1 << 64) - 1
+				expected = vector.evaluate_bitsliced(slots, [int(_w) for _w in words[:, k]], mask)
+				assert [int(_r) for _r in result[:, k]] == expected
+		else:
+			values = numpy.array([[randbelow(Ring.size) for _k in range(batch)] for _n in range(variables_count)], dtype=numpy.uint64)
+			result = program(values)
+			assert result.shape == (len(vector), batch)
+			for k in range(batch):
+				expected = vector.evaluate_slots(slots, [Ring(int(_v)) for _v in values[:, k]])
+				assert [int(_r) for _r in result[:, k]] == [int(_e) for _e in expected]
+	
+	__all__ = __all__ + ('test_program',)
+
+
+if __debug__ and __name__ == '__main__':
+	test_program(BooleanRing.get_algebra(), 8, 12, 3, 16)
+	test_program(ModularRing.get_algebra(size=251), 6, 8, 3, 64)
+	test_program(ModularRing.get_algebra(size=65537), 4, 6, 2, 64)